@@ -1,6 +1,19 @@
 from functools import lru_cache
+from typing import List, Literal, Optional
 
-from pydantic import BaseSettings, Field
+from pydantic import BaseModel, Field
+from pydantic_settings import BaseSettings
+
+
+class ModelTier(BaseModel):
+    """One step of the model cascade; unset fields fall back to the ``openai_*`` settings."""
+
+    name: str = Field(..., description="Label reported in responses and metrics for answers from this tier.")
+    model: Optional[str] = Field(default=None, description="OpenAI model identifier for this tier.")
+    image_detail: Literal["low", "high", "auto"] = Field(
+        default="auto", description="Image detail level requested from the model."
+    )
+    max_output_tokens: Optional[int] = Field(default=None, description="Output token limit for this tier.")
 
 
 class Settings(BaseSettings):
@@ -21,6 +34,74 @@ class Settings(BaseSettings):
         default=600,
         description="Maximum number of output tokens requested from the OpenAI model."
     )
+    openai_structured_output: bool = Field(
+        default=True,
+        description="Constrain model output to the prediction JSON schema; disable for models without support."
+    )
+    openai_base_url: Optional[str] = Field(
+        default=None,
+        description="Override for the OpenAI API base URL, e.g. a local stand-in used for benchmarks."
+    )
+    openai_timeout_seconds: float = Field(
+        default=60.0,
+        description="Timeout for a single OpenAI request."
+    )
+    openai_http2: bool = Field(
+        default=True,
+        description="Whether the shared OpenAI connection pool negotiates HTTP/2."
+    )
+    openai_max_connections: int = Field(
+        default=20,
+        description="Maximum number of open connections in the shared OpenAI connection pool."
+    )
+    openai_max_keepalive_connections: int = Field(
+        default=10,
+        description="Maximum number of idle connections kept alive in the OpenAI connection pool."
+    )
+    openai_keepalive_expiry_seconds: float = Field(
+        default=60.0,
+        description="Seconds an idle pooled OpenAI connection is kept before closing."
+    )
+    openai_max_in_flight: int = Field(
+        default=16,
+        description="Maximum number of concurrent OpenAI calls per process."
+    )
+    openai_max_queue: int = Field(
+        default=64,
+        description="Maximum number of requests waiting for an OpenAI slot before answering 503."
+    )
+    openai_queue_timeout_seconds: float = Field(
+        default=10.0,
+        description="Seconds a request may wait for an OpenAI slot before answering 503."
+    )
+    openai_max_retries: int = Field(
+        default=2,
+        description="Maximum number of retries for an OpenAI call failing with 429 or 5xx."
+    )
+    openai_retry_base_delay_seconds: float = Field(
+        default=0.5,
+        description="Base delay for jittered exponential backoff between OpenAI retries."
+    )
+    openai_retry_max_delay_seconds: float = Field(
+        default=8.0,
+        description="Upper bound on the delay between OpenAI retries."
+    )
+    openai_retry_budget_ratio: float = Field(
+        default=0.1,
+        description="Fraction of OpenAI calls that may be retried."
+    )
+    openai_retry_budget_min_per_second: float = Field(
+        default=1.0,
+        description="Retries per second always allowed regardless of the retry budget ratio."
+    )
+    model_tiers: List[ModelTier] = Field(
+        default_factory=lambda: [
+            ModelTier(name="fast", image_detail="low", max_output_tokens=300),
+            ModelTier(name="full", image_detail="high"),
+        ],
+        description="Model cascade tried in order; an answer below the confidence threshold or naming an "
+        "unknown species escalates to the next tier. Set as JSON; an empty list means a single default tier."
+    )
     top_k: int = Field(
         default=5,
         description="Number of predictions to request from the upstream model."
@@ -29,6 +110,130 @@ class Settings(BaseSettings):
         default=0.6,
         description="Confidence threshold needed to auto-flag an invasive species."
     )
+    upload_max_bytes: int = Field(
+        default=20 * 1024 * 1024,
+        description="Largest accepted upload in bytes; bigger uploads are rejected with 413."
+    )
+    upload_chunk_size: int = Field(
+        default=1024 * 1024,
+        description="Chunk size in bytes used when reading uploads."
+    )
+    image_preprocess_enabled: bool = Field(
+        default=True,
+        description="Whether uploads are downscaled and re-encoded before being sent upstream."
+    )
+    image_max_side: int = Field(
+        default=1024,
+        description="Longest side in pixels of the image sent upstream."
+    )
+    image_jpeg_quality: int = Field(
+        default=85,
+        description="JPEG quality used when re-encoding images sent upstream."
+    )
+    batch_max_images: int = Field(
+        default=50,
+        description="Maximum number of images accepted by one batch classification request."
+    )
+    batch_max_bytes: int = Field(
+        default=100 * 1024 * 1024,
+        description="Largest accepted batch request body in bytes; bigger requests are rejected with 413."
+    )
+    batch_upstream_max_size: int = Field(
+        default=4,
+        description="Maximum number of images packed into a single multi-image model request."
+    )
+    batch_upstream_max_wait_ms: int = Field(
+        default=50,
+        description="Milliseconds a batched image may wait for others before its model request is sent."
+    )
+    coalesce_enabled: bool = Field(
+        default=True,
+        description="Whether concurrent requests for the same image share a single upstream call."
+    )
+    jobs_enabled: bool = Field(
+        default=True,
+        description="Whether asynchronous classification jobs are accepted and processed."
+    )
+    job_db_path: str = Field(
+        default="strikenet_jobs.sqlite3",
+        description="Path to the SQLite file backing the durable job queue."
+    )
+    job_workers: int = Field(
+        default=4,
+        description="Number of in-process workers processing queued jobs."
+    )
+    job_max_pending: int = Field(
+        default=1000,
+        description="Maximum number of queued jobs before new async requests are rejected with 503."
+    )
+    job_interactive_max_bytes: int = Field(
+        default=2 * 1024 * 1024,
+        description="Uploads up to this size default to the interactive priority lane."
+    )
+    job_lease_seconds: float = Field(
+        default=180.0,
+        description="Seconds a worker may hold a job before another worker may reclaim it."
+    )
+    job_max_attempts: int = Field(
+        default=3,
+        description="Maximum number of attempts for a job before it is marked failed."
+    )
+    job_poll_interval_seconds: float = Field(
+        default=1.0,
+        description="Seconds idle workers wait before checking the shared queue for new jobs."
+    )
+    job_retention_seconds: int = Field(
+        default=86400,
+        description="Seconds finished jobs are kept for polling before they are purged."
+    )
+    loop_lag_interval_seconds: float = Field(
+        default=0.1,
+        description="Sampling interval of the event-loop lag monitor."
+    )
+    cache_enabled: bool = Field(
+        default=True,
+        description="Whether classification results are cached by image content."
+    )
+    cache_max_entries: int = Field(
+        default=1024,
+        description="Maximum number of results held in the in-memory LRU cache."
+    )
+    cache_ttl_seconds: int = Field(
+        default=86400,
+        description="Time in seconds a cached classification result stays valid."
+    )
+    cache_perceptual_hash: bool = Field(
+        default=True,
+        description="Also match re-encoded or resized copies of an image via a perceptual hash."
+    )
+    cache_db_path: Optional[str] = Field(
+        default=None,
+        description="Path to a SQLite file used as a cache tier shared by all workers. Disabled when unset."
+    )
+    cache_db_max_entries: int = Field(
+        default=100000,
+        description="Maximum number of results kept in the on-disk cache tier."
+    )
+    persistence_enabled: bool = Field(
+        default=True,
+        description="Whether classifications and feedback are persisted for auditing and retraining."
+    )
+    persistence_db_path: str = Field(
+        default="strikenet_results.sqlite3",
+        description="Path to the SQLite file holding persisted classifications and feedback."
+    )
+    persistence_batch_size: int = Field(
+        default=200,
+        description="Number of buffered records that triggers a write, and the most written per transaction."
+    )
+    persistence_flush_interval_seconds: float = Field(
+        default=1.0,
+        description="Longest time a buffered record waits before it is written."
+    )
+    persistence_max_pending: int = Field(
+        default=10000,
+        description="Maximum number of records buffered in memory; further records are dropped and counted."
+    )
 
     class Config:
         env_prefix = "STRIKENET_"
@@ -1,14 +1,133 @@
 from __future__ import annotations
 
+import asyncio
+import base64
+import binascii
+import json
 import logging
-from fastapi import FastAPI, File, HTTPException, UploadFile, status
+import sqlite3
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Tuple
 
-from app.services.inference import InferenceError, classify_image
+from fastapi import FastAPI, File, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.datastructures import Headers
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+from app.config import Settings, get_settings
+from app.schemas import ClassificationFeedback
+from app.services.inference import InferenceError, classify_image, get_single_flight, stream_classification
+from app.services.jobs import PRIORITY_LANES, TERMINAL_STATUSES, QueueFull, get_job_pool, get_job_store
+from app.services.loop_monitor import get_loop_monitor
+from app.services.metrics import (
+    COALESCING,
+    PAYLOAD_BYTES,
+    REGISTRY,
+    UPSTREAM_IN_FLIGHT,
+    UPSTREAM_WAITING,
+    MetricsMiddleware,
+    record_error,
+    stage,
+)
+from app.services.persistence import PERSISTENCE_PENDING, FeedbackRecord, WriteBehindBuffer, get_result_log
+from app.services.preprocessing import ImageRejected, read_upload, sniff_mime_type
+from app.services.upstream import UpstreamOverloaded, close_upstream, get_upstream
 
 logger = logging.getLogger("strikenet.api")
 logger.setLevel(logging.INFO)
 
-app = FastAPI(title="StrikeNet Invasive Species Classifier")
+# Single-image endpoints whose bodies are capped by ``upload_max_bytes``.
+_SINGLE_UPLOAD_PATHS = frozenset(("/api/classify", "/api/classify/stream"))
+
+# Allowance for multipart boundaries and part headers on top of the image itself.
+_MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    settings = get_settings()
+    get_loop_monitor().start()
+    result_log = get_result_log()
+    if result_log is not None:
+        result_log.start()
+    if settings.jobs_enabled:
+        get_job_pool().start()
+    yield
+    if settings.jobs_enabled:
+        await get_job_pool().stop()
+    # Drain after the workers stop so the classifications they finished are written too.
+    if result_log is not None:
+        await result_log.stop()
+    await get_loop_monitor().stop()
+    await close_upstream()
+
+
+class UploadLimitMiddleware:
+    """Reject single-image uploads over ``upload_max_bytes`` while the body is still arriving.
+
+    FastAPI spools the whole multipart body before the endpoint runs, so the
+    check in ``read_upload`` alone would only answer 413 after accepting an
+    upload of any size. Chunked requests carry no Content-Length, hence the
+    byte count on ``receive`` as well.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] not in _SINGLE_UPLOAD_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = get_settings().upload_max_bytes
+        limit = max_bytes + _MULTIPART_OVERHEAD_BYTES
+        detail = f"Uploaded file exceeds the {max_bytes} byte limit."
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > limit:
+            record_error("UploadTooLarge", "413")
+            response = JSONResponse({"detail": detail}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    record_error("UploadTooLarge", "413")
+                    # Raised inside body parsing, which FastAPI passes on to its HTTPException handler.
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+app = FastAPI(title="StrikeNet Invasive Species Classifier", lifespan=lifespan)
+app.add_middleware(UploadLimitMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+
+def _collect_component_metrics() -> None:
+    if get_upstream.cache_info().currsize:
+        limiter = get_upstream().limiter
+        UPSTREAM_IN_FLIGHT.set(limiter.in_flight)
+        UPSTREAM_WAITING.set(limiter.waiting)
+    stats = get_single_flight().stats()
+    for outcome in ("leaders", "coalesced", "failed", "abandoned"):
+        COALESCING.set_total(stats[outcome], outcome)
+    result_log = get_result_log()
+    if result_log is not None:
+        PERSISTENCE_PENDING.set(result_log.pending)
+
+
+REGISTRY.add_collector(_collect_component_metrics)
 
 
 @app.get("/health", tags=["system"])
@@ -16,27 +135,461 @@ async def healthcheck() -> dict[str, str]:
     return {"status": "ok"}
 
 
-@app.post("/api/classify", tags=["classification"])
-async def classify_species(image: UploadFile = File(...)):
+@app.get("/api/stats", tags=["system"])
+async def service_stats() -> Dict[str, Any]:
+    return {
+        "coalescing": get_single_flight().stats(),
+        "event_loop": get_loop_monitor().stats(),
+    }
+
+
+@app.get("/metrics", tags=["system"], include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+async def _read_image_upload(image: UploadFile, settings: Settings) -> Tuple[bytes, str]:
+    """Validate and read a single-image upload, raising the matching HTTP error on rejection."""
     logger.info("Received classification request", extra={"content_type": image.content_type})
 
     if not image.content_type or not image.content_type.startswith("image/"):
         logger.warning("Rejected upload with unsupported content type", extra={"content_type": image.content_type})
+        record_error("UnsupportedMediaType", "415")
         raise HTTPException(
             status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
             detail="Only image uploads are supported."
         )
 
-    image_bytes = await image.read()
+    try:
+        with stage("read"):
+            image_bytes, mime_type = await read_upload(image, settings.upload_max_bytes, settings.upload_chunk_size)
+    except ImageRejected as exc:
+        logger.warning("Rejected upload", extra={"reason": str(exc)})
+        record_error(type(exc).__name__, str(exc.status_code))
+        raise HTTPException(status_code=exc.status_code, detail=str(exc)) from exc
     if not image_bytes:
         logger.warning("Rejected upload with empty payload")
+        record_error("EmptyUpload", "400")
         raise HTTPException(status_code=400, detail="Uploaded file is empty.")
+    PAYLOAD_BYTES.observe(len(image_bytes), "upload")
+
+    logger.info("Read image payload", extra={"size_bytes": len(image_bytes), "mime_type": mime_type})
+    return image_bytes, mime_type
+
 
-    logger.info("Read image payload", extra={"size_bytes": len(image_bytes)})
-   
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/api/classify", tags=["classification"])
+async def classify_species(
+    response: Response,
+    image: UploadFile = File(...),
+    mode: Literal["sync", "async"] = Query("sync", description="`async` queues a job and answers 202."),
+    priority: Optional[Literal["interactive", "bulk"]] = Query(
+        None, description="Job lane for async mode; defaults by upload size."
+    ),
+):
+    settings = get_settings()
+    image_bytes, mime_type = await _read_image_upload(image, settings)
+
+    if mode == "async":
+        return await _enqueue_job(image_bytes, mime_type, priority, settings)
 
     try:
-        return await classify_image(image_bytes, image.content_type)
+        result = await classify_image(image_bytes, mime_type)
+    except ImageRejected as exc:
+        logger.warning("Rejected undecodable image", extra={"reason": str(exc)})
+        record_error(type(exc).__name__, str(exc.status_code))
+        raise HTTPException(status_code=exc.status_code, detail=str(exc)) from exc
+    except UpstreamOverloaded as exc:
+        logger.warning("Rejected request while upstream is saturated")
+        record_error("UpstreamOverloaded", "503")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(exc),
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
     except InferenceError as exc:
         logger.exception("Inference call failed")
+        record_error("InferenceError", exc.cause)
         raise HTTPException(status_code=502, detail=str(exc)) from exc
+
+    response.headers["X-Cache"] = result.cache.status
+    response.headers["X-Model-Tier"] = result.prediction.get("tier", "")
+    if result.record_id is not None:
+        response.headers["X-Classification-Id"] = result.record_id
+    if result.cache.value is not None:
+        response.headers["X-Cache-Source"] = f"{result.cache.source}:{result.cache.match}"
+    if result.coalesced:
+        response.headers["X-Coalesced"] = "true"
+    if result.preprocess is not None:
+        response.headers["X-Image-Bytes-Original"] = str(result.preprocess.original_bytes)
+        response.headers["X-Image-Bytes-Sent"] = str(result.preprocess.sent_bytes)
+        response.headers["X-Image-Bytes-Saved"] = str(result.preprocess.bytes_saved)
+    return result.prediction
+
+
+@app.post("/api/classify/stream", tags=["classification"])
+async def classify_species_stream(image: UploadFile = File(...)) -> StreamingResponse:
+    """Server-sent event variant of ``/api/classify``.
+
+    Emits ``verdict`` as soon as the model has committed to a label,
+    confidence, invasive and hunting_allowed, then ``details`` and a final
+    ``result``. Failures after the stream has started arrive as an
+    ``error`` event carrying the HTTP status the sync endpoint would use.
+    """
+    image_bytes, mime_type = await _read_image_upload(image, get_settings())
+    record_id = uuid.uuid4().hex
+    try:
+        classification = await stream_classification(image_bytes, mime_type, record_id=record_id)
+    except ImageRejected as exc:
+        logger.warning("Rejected undecodable image", extra={"reason": str(exc)})
+        record_error(type(exc).__name__, str(exc.status_code))
+        raise HTTPException(status_code=exc.status_code, detail=str(exc)) from exc
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for event, data in classification:
+                yield _sse(event, data)
+        except UpstreamOverloaded as exc:
+            record_error("UpstreamOverloaded", "503")
+            yield _sse("error", {"status": 503, "detail": str(exc), "retry_after": exc.retry_after})
+        except InferenceError as exc:
+            logger.warning("Streaming inference failed", extra={"reason": str(exc)})
+            record_error("InferenceError", exc.cause)
+            yield _sse("error", {"status": 502, "detail": str(exc)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Classification-Id": record_id},
+    )
+
+
+async def _enqueue_job(
+    image_bytes: bytes, mime_type: str, priority: Optional[str], settings: Settings
+) -> JSONResponse:
+    if not settings.jobs_enabled:
+        raise HTTPException(status_code=400, detail="Asynchronous jobs are disabled.")
+    if priority is None:
+        priority = "interactive" if len(image_bytes) <= settings.job_interactive_max_bytes else "bulk"
+
+    try:
+        job_id = await get_job_pool().submit(image_bytes, mime_type, PRIORITY_LANES[priority])
+    except QueueFull as exc:
+        logger.warning("Rejected async request while job queue is full")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(exc),
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
+
+    status_url = app.url_path_for("get_job", job_id=job_id)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "job_id": job_id,
+            "status": "queued",
+            "priority": priority,
+            "status_url": status_url,
+            "events_url": app.url_path_for("stream_job_events", job_id=job_id),
+        },
+        headers={"Location": status_url},
+    )
+
+
+async def _load_job(job_id: str) -> Dict[str, Any]:
+    job = await asyncio.to_thread(get_job_store().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
+@app.get("/api/jobs/{job_id}", tags=["classification"])
+async def get_job(job_id: str) -> Dict[str, Any]:
+    return await _load_job(job_id)
+
+
+@app.get("/api/jobs/{job_id}/events", tags=["classification"])
+async def stream_job_events(job_id: str) -> StreamingResponse:
+    """Push job status changes as server-sent events until the job finishes."""
+    job = await _load_job(job_id)
+    poll_interval = min(get_settings().job_poll_interval_seconds, 0.5)
+
+    async def events() -> AsyncIterator[str]:
+        current = job
+        last_status = None
+        while True:
+            if current["status"] != last_status:
+                last_status = current["status"]
+                event = "result" if last_status in TERMINAL_STATUSES else "status"
+                yield _sse(event, current)
+            if last_status in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(poll_interval)
+            current = await _load_job(job_id)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@dataclass
+class _BatchItem:
+    id: str
+    image_bytes: bytes = b""
+    mime_type: str = ""
+    status_code: int = 200
+    detail: Optional[str] = None
+
+
+@app.post("/api/classify/batch", tags=["classification"])
+async def classify_batch(request: Request) -> StreamingResponse:
+    """Classify many images, streaming one NDJSON line per image as each finishes.
+
+    Accepts either ``multipart/form-data`` with repeated ``images`` fields or
+    an ``application/x-ndjson`` body with one ``{"id": ..., "image": <base64>}``
+    object per line.
+    """
+    settings = get_settings()
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > settings.batch_max_bytes:
+        raise _batch_too_large(settings)
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        items = await _read_multipart_batch(request, settings)
+    elif content_type.startswith(("application/x-ndjson", "application/jsonl")):
+        items = await _read_ndjson_batch(request, settings)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Batch uploads must be multipart/form-data or application/x-ndjson."
+        )
+
+    if not items:
+        raise HTTPException(status_code=400, detail="Batch contains no images.")
+    logger.info("Received batch classification request", extra={"image_count": len(items)})
+    return StreamingResponse(_stream_batch_results(items), media_type="application/x-ndjson")
+
+
+def _too_many_images(settings: Settings) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Batch exceeds the {settings.batch_max_images} image limit."
+    )
+
+
+def _batch_too_large(settings: Settings) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Batch exceeds the {settings.batch_max_bytes} byte limit."
+    )
+
+
+async def _limited_body(request: Request, settings: Settings) -> AsyncIterator[bytes]:
+    """Yield the request body, failing with 413 once it exceeds ``batch_max_bytes``.
+
+    Checked while streaming because chunked requests carry no Content-Length.
+    """
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > settings.batch_max_bytes:
+            raise _batch_too_large(settings)
+        yield chunk
+
+
+async def _read_multipart_batch(request: Request, settings: Settings) -> List[_BatchItem]:
+    # Parsed directly rather than via request.form() so the body size limit applies while parsing.
+    parser = MultiPartParser(
+        request.headers, _limited_body(request, settings), max_files=settings.batch_max_images + 1
+    )
+    try:
+        form = await parser.parse()
+    except MultiPartException as exc:
+        raise HTTPException(status_code=400, detail=exc.message) from exc
+
+    try:
+        uploads = [value for value in form.getlist("images") if isinstance(value, StarletteUploadFile)]
+        if len(uploads) > settings.batch_max_images:
+            raise _too_many_images(settings)
+
+        items: List[_BatchItem] = []
+        for index, upload in enumerate(uploads):
+            item = _BatchItem(id=upload.filename or str(index))
+            try:
+                item.image_bytes, item.mime_type = await read_upload(
+                    upload, settings.upload_max_bytes, settings.upload_chunk_size
+                )
+            except ImageRejected as exc:
+                record_error(type(exc).__name__, str(exc.status_code))
+                item.status_code, item.detail = exc.status_code, str(exc)
+            items.append(item)
+        return items
+    finally:
+        await form.close()
+
+
+async def _read_ndjson_batch(request: Request, settings: Settings) -> List[_BatchItem]:
+    """Decode each line as soon as it is complete so only one line of base64 text is held at a time."""
+    # Base64 inflates payloads by 4/3; allow a little slack for the JSON envelope.
+    max_line = settings.upload_max_bytes * 4 // 3 + 4096
+    buffer = bytearray()
+    items: List[_BatchItem] = []
+
+    def add_line(line: bytes) -> None:
+        if not line.strip():
+            return
+        if len(items) >= settings.batch_max_images:
+            raise _too_many_images(settings)
+        items.append(_parse_ndjson_line(len(items), line, settings))
+
+    async for chunk in _limited_body(request, settings):
+        *complete, rest = chunk.split(b"\n")
+        if complete:
+            buffer += complete[0]
+            add_line(bytes(buffer))
+            buffer = bytearray()
+            for line in complete[1:]:
+                add_line(line)
+        buffer += rest
+        if len(buffer) > max_line:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Batch line exceeds the {max_line} byte limit."
+            )
+    add_line(bytes(buffer))
+    return items
+
+
+def _parse_ndjson_line(index: int, line: bytes, settings: Settings) -> _BatchItem:
+    item = _BatchItem(id=str(index))
+    try:
+        entry = json.loads(line)
+        item.id = str(entry.get("id", index))
+        item.image_bytes = base64.b64decode(entry["image"], validate=True)
+    except (ValueError, KeyError, TypeError, AttributeError, binascii.Error):
+        record_error("MalformedBatchLine", "400")
+        item.status_code, item.detail = 400, "Line must be a JSON object with a base64 \"image\" field."
+        return item
+
+    if len(item.image_bytes) > settings.upload_max_bytes:
+        record_error("UploadTooLarge", "413")
+        item.status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        item.detail = f"Uploaded file exceeds the {settings.upload_max_bytes} byte limit."
+        item.image_bytes = b""
+    elif item.image_bytes:
+        # Empty items are left for the shared empty-upload check in ``_classify_batch_item``.
+        item.mime_type = sniff_mime_type(item.image_bytes[:12]) or ""
+        if not item.mime_type:
+            record_error("UnsupportedImage", "415")
+            item.status_code = status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            item.detail = "Uploaded file is not a supported image format."
+            item.image_bytes = b""
+    return item
+
+
+async def _classify_batch_item(index: int, item: _BatchItem) -> Dict[str, Any]:
+    line: Dict[str, Any] = {"index": index, "id": item.id}
+    if item.detail is None and not item.image_bytes:
+        record_error("EmptyUpload", "400")
+        item.status_code, item.detail = 400, "Uploaded file is empty."
+    if item.detail is not None:
+        return {**line, "status": item.status_code, "error": item.detail}
+
+    try:
+        result = await classify_image(item.image_bytes, item.mime_type, batched=True, source="batch")
+    except ImageRejected as exc:
+        record_error(type(exc).__name__, str(exc.status_code))
+        return {**line, "status": exc.status_code, "error": str(exc)}
+    except UpstreamOverloaded as exc:
+        record_error("UpstreamOverloaded", "503")
+        return {**line, "status": 503, "error": str(exc), "retry_after": exc.retry_after}
+    except InferenceError as exc:
+        logger.warning("Batched inference failed", extra={"index": index, "reason": str(exc)})
+        record_error("InferenceError", exc.cause)
+        return {**line, "status": 502, "error": str(exc)}
+    return {
+        **line,
+        "status": 200,
+        "cache": result.cache.status,
+        "coalesced": result.coalesced,
+        "classification_id": result.record_id,
+        "result": result.prediction,
+    }
+
+
+async def _stream_batch_results(items: List[_BatchItem]) -> AsyncIterator[str]:
+    tasks = [asyncio.ensure_future(_classify_batch_item(index, item)) for index, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield json.dumps(await next_done) + "\n"
+    finally:
+        # The client may disconnect mid-stream; do not keep classifying for nobody.
+        for task in tasks:
+            task.cancel()
+
+
+def _require_result_log() -> WriteBehindBuffer:
+    result_log = get_result_log()
+    if result_log is None:
+        raise HTTPException(status_code=404, detail="Persistence is disabled.")
+    return result_log
+
+
+@app.get("/api/classifications", tags=["history"])
+async def recent_classifications(
+    limit: int = Query(50, ge=1, le=500),
+    species: Optional[str] = Query(None, description="Only classifications with this label."),
+    before: Optional[float] = Query(None, description="Unix timestamp; page backwards from here."),
+) -> List[Dict[str, Any]]:
+    """Most recent persisted classifications, newest first.
+
+    Records are written in batches, so the last second or so of traffic
+    may not be visible yet.
+    """
+    store = _require_result_log().store
+    return await asyncio.to_thread(store.recent, limit, species, before)
+
+
+@app.get("/api/classifications/review", tags=["history"])
+async def review_queue(
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[float] = Query(None, description="Unix timestamp; page backwards from here."),
+) -> List[Dict[str, Any]]:
+    """Classifications below the confidence threshold that have no feedback yet, newest first."""
+    store = _require_result_log().store
+    return await asyncio.to_thread(store.review_queue, limit, before)
+
+
+@app.get("/api/classifications/species", tags=["history"])
+async def species_counts(
+    since: Optional[float] = Query(None, description="Unix timestamp; only count classifications after it."),
+) -> List[Dict[str, Any]]:
+    store = _require_result_log().store
+    return await asyncio.to_thread(store.species_counts, since)
+
+
+@app.post("/api/classifications/{classification_id}/feedback", tags=["history"], status_code=202)
+async def submit_feedback(classification_id: str, feedback: ClassificationFeedback) -> Dict[str, Any]:
+    result_log = _require_result_log()
+    try:
+        known = await result_log.has_classification(classification_id)
+    except sqlite3.Error as exc:
+        logger.exception("Classification lookup failed")
+        raise HTTPException(status_code=503, detail="Result store is unavailable.") from exc
+    if not known:
+        raise HTTPException(status_code=404, detail="Classification not found.")
+    accepted = result_log.add(FeedbackRecord(
+        classification_id=classification_id,
+        created_at=time.time(),
+        correct=feedback.correct,
+        species=feedback.species.strip().lower() if feedback.species else None,
+        comment=feedback.comment,
+    ))
+    if not accepted:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Feedback buffer is full; try again shortly.",
+            headers={"Retry-After": "1"},
+        )
+    return {"classification_id": classification_id, "status": "accepted"}
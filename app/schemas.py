@@ -10,3 +10,57 @@ class ModelPrediction(BaseModel):
     hunting_allowed: bool
     details: Optional[str] = None
 
+
+class ClassificationFeedback(BaseModel):
+    correct: bool = Field(..., description="Whether the stored classification was right.")
+    species: Optional[str] = Field(default=None, description="The actual species, when the classification was wrong.")
+    comment: Optional[str] = Field(default=None, max_length=2000)
+
+
+# JSON schemas the upstream model is constrained to; ``label`` and
+# ``confidence`` become ``ModelPrediction.species`` and ``ModelPrediction.score``.
+# Only the streaming endpoint asks for ``details``: strict mode makes every
+# property required, so the other paths use the verdict alone and do not pay
+# for prose. Fields are emitted in this order, so the verdict arrives first.
+VERDICT_OUTPUT_PROPERTIES = {
+    "label": {"type": "string", "description": "Lowercase common name, or \"unknown\"."},
+    "confidence": {"type": "number", "description": "Confidence between 0.0 and 1.0."},
+    "invasive": {"type": "boolean", "description": "Whether the species is invasive in South Florida."},
+    "hunting_allowed": {"type": "boolean", "description": "Whether hunting it is allowed in South Florida."},
+}
+
+MODEL_OUTPUT_PROPERTIES = {
+    **VERDICT_OUTPUT_PROPERTIES,
+    "details": {"type": ["string", "null"], "description": "Short notes on identification and habitat."},
+}
+
+VERDICT_OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": VERDICT_OUTPUT_PROPERTIES,
+    "required": list(VERDICT_OUTPUT_PROPERTIES),
+    "additionalProperties": False,
+}
+
+MODEL_OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": MODEL_OUTPUT_PROPERTIES,
+    "required": list(MODEL_OUTPUT_PROPERTIES),
+    "additionalProperties": False,
+}
+
+BATCH_MODEL_OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "predictions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"index": {"type": "integer"}, **VERDICT_OUTPUT_PROPERTIES},
+                "required": ["index", *VERDICT_OUTPUT_PROPERTIES],
+                "additionalProperties": False,
+            },
+        }
+    },
+    "required": ["predictions"],
+    "additionalProperties": False,
+}
@@ -0,0 +1,83 @@
+"""Micro-batching of concurrent submissions into single upstream calls."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Generic, List, Optional, Set, Tuple, TypeVar, Union
+
+logger = logging.getLogger("strikenet.batching")
+logger.setLevel(logging.INFO)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+BatchHandler = Callable[[List[T]], Awaitable[List[Union[R, Exception]]]]
+
+
+class MicroBatcher(Generic[T, R]):
+    """Collects items submitted within ``max_wait`` seconds into one handler call.
+
+    A batch is flushed as soon as it holds ``max_batch_size`` items or the
+    oldest item has waited ``max_wait`` seconds. The handler returns one
+    result or exception per item, so a failure for one item only fails
+    that item's submitter. An exception raised by the handler itself fails
+    the whole batch.
+    """
+
+    def __init__(self, handler: BatchHandler, max_batch_size: int, max_wait: float) -> None:
+        self._handler = handler
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+        self._pending: List[Tuple[T, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, item: T) -> R:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self._max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[T, asyncio.Future]]) -> None:
+        # Submitters that gave up while waiting do not need an upstream slot.
+        live = [(item, future) for item, future in batch if not future.done()]
+        if not live:
+            return
+        logger.info("Flushing micro-batch", extra={"batch_size": len(live)})
+        try:
+            results = await self._handler([item for item, _ in live])
+        except asyncio.CancelledError:
+            for _, future in live:
+                future.cancel()
+            raise
+        except Exception as exc:  # noqa: BLE001 - fanned out to every submitter
+            for _, future in live:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for (_, future), result in zip(live, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        for _, future in live[len(results):]:
+            if not future.done():
+                future.set_exception(RuntimeError("Batch handler returned too few results."))
@@ -0,0 +1,288 @@
+"""Content-addressed cache for classification results with in-memory and SQLite tiers."""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger("strikenet.cache")
+logger.setLevel(logging.INFO)
+
+# Number of writes between sweeps of expired/overflowing rows in the disk tier.
+_DISK_TRIM_INTERVAL = 256
+
+# Coarse hashes with fewer set (or unset) bits than this come from flat or
+# low-texture images, which all look alike to a 9x8 dHash; they are not cached.
+_MIN_HASH_BITS = 6
+
+# A perceptual hit is only trusted when the 16x16 detail hashes differ in at
+# most this many of their 256 bits.
+_MAX_DETAIL_DISTANCE = 20
+
+
+def image_digest(image_bytes: bytes) -> str:
+    """Return the hex SHA-256 digest identifying the exact image bytes."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def _dhash(gray: Image.Image, width: int, height: int) -> int:
+    pixels = list(gray.resize((width + 1, height), Image.LANCZOS).getdata())
+    bits = 0
+    for row in range(height):
+        offset = row * (width + 1)
+        for col in range(width):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+@dataclass(frozen=True)
+class PerceptualHash:
+    """Coarse hash used as the cache key plus a finer hash checked on every hit.
+
+    ``key`` combines a 64-bit difference hash with the image's aspect ratio,
+    so re-encoded or resized copies share it; ``detail`` is a 256-bit hash
+    that must also be close before a stored result is reused.
+    """
+
+    key: str
+    detail: str
+
+    def matches(self, detail: str) -> bool:
+        return bin(int(self.detail, 16) ^ int(detail, 16)).count("1") <= _MAX_DETAIL_DISTANCE
+
+
+def perceptual_hash(image_bytes: bytes) -> Optional[PerceptualHash]:
+    """Return a perceptual hash that survives re-encoding and resizing.
+
+    Returns ``None`` when the payload cannot be decoded as an image or is
+    too flat for the hash to tell it apart from other images.
+    """
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            aspect = img.width / img.height
+            # Let JPEG decoders skip most of the work for large photos.
+            img.draft("L", (128, 128))
+            gray = img.convert("L")
+            coarse = _dhash(gray, 8, 8)
+            detail = _dhash(gray, 16, 16)
+    except Exception:  # noqa: BLE001 - any decode failure just disables the perceptual match
+        logger.debug("Could not compute perceptual hash", exc_info=True)
+        return None
+
+    if not _MIN_HASH_BITS <= bin(coarse).count("1") <= 64 - _MIN_HASH_BITS:
+        return None
+    return PerceptualHash(key=f"{coarse:016x}:{aspect:.2f}", detail=f"{detail:064x}")
+
+
+@dataclass(frozen=True)
+class CacheKeys:
+    digest: str
+    perceptual: Optional[PerceptualHash] = None
+
+
+@dataclass(frozen=True)
+class CacheLookup:
+    value: Optional[Dict[str, Any]] = None
+    source: Optional[str] = None
+    match: Optional[str] = None
+
+    @property
+    def status(self) -> str:
+        if self.value is not None:
+            return "hit"
+        return "bypass" if self.source == "bypass" else "miss"
+
+
+class _MemoryTier:
+    """LRU map with per-entry expiry. Only touched from the event loop thread."""
+
+    def __init__(self, max_entries: int) -> None:
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+
+class _DiskTier:
+    """SQLite-backed tier shared by every worker process pointing at the same file."""
+
+    def __init__(self, path: str, max_entries: int) -> None:
+        self._path = path
+        self._max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS classification_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS classification_cache_created_at"
+            " ON classification_cache (created_at)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM classification_cache WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        if row is None:
+            return None
+        return row[1], json.loads(row[0])
+
+    def set(self, entries: Dict[str, Dict[str, Any]], expires_at: float) -> None:
+        now = time.time()
+        conn = self._connect()
+        conn.executemany(
+            "INSERT OR REPLACE INTO classification_cache (key, value, created_at, expires_at)"
+            " VALUES (?, ?, ?, ?)",
+            [(key, json.dumps(value), now, expires_at) for key, value in entries.items()],
+        )
+        self._writes += 1
+        if self._writes % _DISK_TRIM_INTERVAL == 0:
+            self._trim(conn, now)
+
+    def _trim(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM classification_cache WHERE expires_at <= ?", (now,))
+        conn.execute(
+            "DELETE FROM classification_cache WHERE key IN ("
+            " SELECT key FROM classification_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self._max_entries,),
+        )
+
+
+class ClassificationCache:
+    """Two-tier cache of parsed model predictions keyed by image content.
+
+    ``namespace`` must change whenever the model or prompt changes so stale
+    predictions are never served for a different configuration.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        *,
+        max_entries: int,
+        ttl_seconds: int,
+        perceptual: bool = False,
+        db_path: Optional[str] = None,
+        db_max_entries: int = 100000,
+    ) -> None:
+        self._namespace = namespace
+        self._ttl_seconds = ttl_seconds
+        self._perceptual = perceptual
+        self._memory = _MemoryTier(max_entries)
+        self._disk = _DiskTier(db_path, db_max_entries) if db_path else None
+
+    def _storage_key(self, kind: str, value: str) -> str:
+        return f"{self._namespace}:{kind}:{value}"
+
+    async def _get_key(self, key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        value = self._memory.get(key)
+        if value is not None:
+            return "memory", value
+        if self._disk is None:
+            return None
+        try:
+            entry = await asyncio.to_thread(self._disk.get, key)
+        except sqlite3.Error:
+            logger.exception("Disk cache lookup failed")
+            return None
+        if entry is None:
+            return None
+        expires_at, value = entry
+        self._memory.set(key, value, expires_at)
+        return "disk", value
+
+    async def lookup(self, image_bytes: bytes) -> Tuple[CacheKeys, CacheLookup]:
+        """Look the image up by exact digest, then by perceptual hash."""
+        keys, found = await self.lookup_digest(image_bytes)
+        if found.value is not None:
+            return keys, found
+        return await self.lookup_perceptual(image_bytes, keys)
+
+    async def lookup_digest(self, image_bytes: bytes) -> Tuple[CacheKeys, CacheLookup]:
+        """Look the image up by its exact bytes; cheap, no decoding involved."""
+        keys = CacheKeys(digest=image_digest(image_bytes))
+        found = await self._get_key(self._storage_key("sha256", keys.digest))
+        if found is not None:
+            return keys, CacheLookup(value=found[1], source=found[0], match="digest")
+        return keys, CacheLookup()
+
+    async def lookup_perceptual(self, image_bytes: bytes, keys: CacheKeys) -> Tuple[CacheKeys, CacheLookup]:
+        """Look the image up by perceptual hash after an exact-digest miss.
+
+        Computing the hash decodes the image, so callers should only get
+        here once ``lookup_digest`` has missed.
+        """
+        if not self._perceptual:
+            return keys, CacheLookup()
+        phash = await asyncio.to_thread(perceptual_hash, image_bytes)
+        keys = CacheKeys(digest=keys.digest, perceptual=phash)
+        if phash is None:
+            return keys, CacheLookup()
+        found = await self._get_key(self._storage_key("dhash", phash.key))
+        if found is None or not phash.matches(found[1].get("detail", "")):
+            return keys, CacheLookup()
+        value = found[1]["value"]
+        # Later uploads of these exact bytes can then skip the decode.
+        await self._store({self._storage_key("sha256", keys.digest): value})
+        return keys, CacheLookup(value=value, source=found[0], match="perceptual")
+
+    async def set(self, keys: CacheKeys, value: Dict[str, Any]) -> None:
+        entries = {self._storage_key("sha256", keys.digest): value}
+        if keys.perceptual is not None:
+            entries[self._storage_key("dhash", keys.perceptual.key)] = {
+                "detail": keys.perceptual.detail,
+                "value": value,
+            }
+        await self._store(entries)
+
+    async def _store(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        expires_at = time.time() + self._ttl_seconds
+        for key, value in entries.items():
+            self._memory.set(key, value, expires_at)
+
+        if self._disk is None:
+            return
+        try:
+            await asyncio.to_thread(self._disk.set, entries, expires_at)
+        except sqlite3.Error:
+            logger.exception("Disk cache write failed")
@@ -0,0 +1,76 @@
+"""Single-flight coalescing of concurrent identical upstream calls."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Generic, Tuple, TypeVar
+
+logger = logging.getLogger("strikenet.coalescing")
+logger.setLevel(logging.INFO)
+
+R = TypeVar("R")
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class SingleFlight(Generic[R]):
+    """Runs at most one call per key; concurrent callers with the same key share its outcome.
+
+    The shared call runs in its own task, so a caller that is cancelled
+    only stops waiting; the call itself is cancelled once no caller is
+    left waiting for it. Exceptions are raised in every waiting caller.
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[str, _Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.abandoned = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "abandoned": self.abandoned,
+            "in_flight": len(self._flights),
+        }
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[R]]) -> Tuple[R, bool]:
+        """Return ``fn()``'s result and whether it was shared with an earlier caller."""
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._finish(key, flight))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+            logger.info("Coalesced duplicate request", extra={"waiters": flight.waiters + 1})
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), shared
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                self.abandoned += 1
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _finish(self, key: str, flight: _Flight) -> None:
+        self._forget(key, flight)
+        if not flight.task.cancelled() and flight.task.exception() is not None:
+            # Retrieving the exception here also keeps asyncio from logging it as unhandled.
+            self.failed += 1
@@ -5,18 +5,45 @@ import asyncio
 import base64
 import json
 import logging
+import time
+import uuid
+from contextlib import aclosing
 from dataclasses import dataclass
-from typing import List
-from openai import OpenAI
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
 from dotenv import load_dotenv
 import os
 
+from app.config import ModelTier, get_settings
+from app.data.species import lookup_species
+from app.schemas import BATCH_MODEL_OUTPUT_SCHEMA, MODEL_OUTPUT_SCHEMA, VERDICT_OUTPUT_SCHEMA
+from app.services.batching import MicroBatcher
+from app.services.cache import CacheKeys, CacheLookup, ClassificationCache, image_digest
+from app.services.coalescing import SingleFlight
+from app.services.metrics import (
+    CACHE_LOOKUPS,
+    CASCADE_ABANDONED,
+    CASCADE_ANSWERS,
+    CASCADE_ESCALATIONS,
+    PAYLOAD_BYTES,
+    STAGE_SECONDS,
+    TIER_SECONDS,
+    UPSTREAM_TOKENS,
+    stage,
+)
+from app.services.partial_json import IncrementalObjectParser
+from app.services.persistence import record_classification
+from app.services.preprocessing import PreprocessStats, prepare_image
+from app.services.upstream import UpstreamOverloaded, get_upstream
+
 load_dotenv()
 
-API_KEY = os.getenv("STRIKENET_OPENAI_API_KEY")
 logger = logging.getLogger("strikenet.inference")
 logger.setLevel(logging.INFO)
 
+# Bump whenever the prompt or response parsing changes so cached results are invalidated.
+PROMPT_VERSION = "3"
+
 _SYSTEM_PROMPT = (
     "You are a wildlife identification assistant who specializes in identifying species from images and providing detailed information about"
     "them and clarify if they are they invasive to south florida and allowed to be hunted. "
@@ -24,9 +51,26 @@ _SYSTEM_PROMPT = (
     "Use lowercase for the label field. If unsure, use label \"unknown\" and confidence 0.0."
 )
 
+_BATCH_INSTRUCTIONS = (
+    "Identify the species in each of the {count} images that follow. "
+    "Respond with a JSON object whose \"predictions\" array contains one object per image, in the same order, "
+    "each with an integer \"index\" field (0-based position of the image) alongside the usual fields."
+)
+
+# Fields that make up the verdict; everything after them is optional detail.
+_VERDICT_FIELDS = ("label", "confidence", "invasive", "hunting_allowed")
+
 
 class InferenceError(RuntimeError):
-    """Raised when the upstream model call fails."""
+    """Raised when the upstream model call fails.
+
+    ``cause`` is ``"upstream"`` when the call itself failed and ``"parse"``
+    when the model answered with something unusable.
+    """
+
+    def __init__(self, message: str, cause: str = "upstream") -> None:
+        super().__init__(message)
+        self.cause = cause
 
 
 @dataclass
@@ -35,71 +79,579 @@ class ModelPrediction:
     score: float
 
 
-async def classify_image(image_bytes: bytes, mime_type: str | None) -> Any:
-    """Send the image to the configured OpenAI vision-capable model."""
+@dataclass
+class ClassificationResult:
+    prediction: Dict[str, Any]
+    cache: CacheLookup
+    preprocess: Optional[PreprocessStats] = None
+    coalesced: bool = False
+    record_id: Optional[str] = None
+
+
+@lru_cache()
+def get_model_tiers() -> Tuple[ModelTier, ...]:
+    """Return the model cascade with unset tier fields filled from the ``openai_*`` settings."""
+    settings = get_settings()
+    tiers = settings.model_tiers or [ModelTier(name="default")]
+    return tuple(
+        tier.model_copy(update={
+            "model": tier.model or settings.openai_model,
+            "max_output_tokens": tier.max_output_tokens or settings.openai_max_output_tokens,
+        })
+        for tier in tiers
+    )
+
+
+def _namespace() -> str:
+    """Identify the model configuration a prediction was produced with."""
+    tiers = ",".join(f"{tier.name}={tier.model}/{tier.image_detail}" for tier in get_model_tiers())
+    return f"{tiers}@{get_settings().classification_confidence_threshold}:{PROMPT_VERSION}"
+
+
+@lru_cache()
+def get_result_cache() -> Optional[ClassificationCache]:
+    """Return the process-wide result cache, or ``None`` when caching is disabled."""
+    settings = get_settings()
+    if not settings.cache_enabled:
+        return None
+    return ClassificationCache(
+        _namespace(),
+        max_entries=settings.cache_max_entries,
+        ttl_seconds=settings.cache_ttl_seconds,
+        perceptual=settings.cache_perceptual_hash,
+        db_path=settings.cache_db_path,
+        db_max_entries=settings.cache_db_max_entries,
+    )
+
+
+@lru_cache()
+def get_batcher(tier_index: int = 0) -> MicroBatcher:
+    """Return the process-wide batcher packing images into multi-image requests to one model tier."""
+    settings = get_settings()
+    tier = get_model_tiers()[tier_index]
+
+    async def handler(images: List[Tuple[bytes, str | None]]) -> List[Union[Dict[str, Any], Exception]]:
+        return await _call_model_batch(tier, images)
+
+    return MicroBatcher(
+        handler,
+        max_batch_size=settings.batch_upstream_max_size,
+        max_wait=settings.batch_upstream_max_wait_ms / 1000,
+    )
+
+
+@lru_cache()
+def get_single_flight() -> SingleFlight:
+    """Return the process-wide coalescer for concurrent identical classifications."""
+    return SingleFlight()
+
+
+async def classify_image(
+    image_bytes: bytes,
+    mime_type: str | None,
+    *,
+    batched: bool = False,
+    source: str = "sync",
+    record_id: Optional[str] = None,
+) -> ClassificationResult:
+    """Classify the image, serving repeated uploads from the result cache.
+
+    With ``batched`` the upstream call may be shared with other images
+    submitted at about the same time, trading a little latency for fewer
+    model requests. Concurrent requests for the same image share a single
+    perceptual lookup and upstream call. The prediction's ``tier`` names the model tier that
+    answered.
+
+    Every answer, cached or not, is queued for persistence under
+    ``record_id`` (a fresh id when omitted), tagged with ``source``.
+    """
+
+    started = time.perf_counter()
+    record_id = record_id or uuid.uuid4().hex
+    cache = get_result_cache()
+    keys, lookup = CacheKeys(digest=image_digest(image_bytes)), CacheLookup(source="bypass")
+    if cache is not None:
+        with stage("cache_lookup"):
+            keys, lookup = await cache.lookup_digest(image_bytes)
+        if lookup.value is not None:
+            return _serve_cached(record_id, keys, lookup, source, started)
+
+    async def lookup_classify_and_store() -> Tuple[Dict[str, Any], Optional[PreprocessStats], CacheLookup]:
+        # The perceptual lookup decodes the image, so it runs once per flight rather than once per caller.
+        flight_keys, flight_lookup = keys, lookup
+        if cache is not None:
+            with stage("cache_lookup"):
+                flight_keys, flight_lookup = await cache.lookup_perceptual(image_bytes, keys)
+            if flight_lookup.value is not None:
+                return flight_lookup.value, None, flight_lookup
+        prediction, stats = await _classify_uncached(image_bytes, mime_type, batched)
+        if cache is not None:
+            await cache.set(flight_keys, prediction)
+        return prediction, stats, flight_lookup
+
+    if get_settings().coalesce_enabled:
+        (prediction, stats, lookup), coalesced = await get_single_flight().do(
+            f"{_namespace()}:{keys.digest}", lookup_classify_and_store
+        )
+    else:
+        (prediction, stats, lookup), coalesced = await lookup_classify_and_store(), False
+    if lookup.value is not None:
+        return _serve_cached(record_id, keys, lookup, source, started, coalesced)
+    if cache is not None:
+        CACHE_LOOKUPS.inc(lookup.status)
+    _persist(record_id, keys.digest, prediction, source, lookup.status, started)
+    return ClassificationResult(prediction, lookup, stats, coalesced, record_id)
+
+
+def _serve_cached(
+    record_id: str, keys: CacheKeys, lookup: CacheLookup, source: str, started: float, coalesced: bool = False
+) -> ClassificationResult:
+    assert lookup.value is not None
+    CACHE_LOOKUPS.inc(lookup.status)
+    logger.info("Serving cached classification", extra={"source": lookup.source, "match": lookup.match})
+    _persist(record_id, keys.digest, lookup.value, source, lookup.status, started)
+    return ClassificationResult(lookup.value, lookup, coalesced=coalesced, record_id=record_id)
+
+
+async def stream_classification(
+    image_bytes: bytes, mime_type: str | None, *, record_id: Optional[str] = None
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Classify the image, returning an iterator of ``(event, data)`` pairs as the answer streams in.
+
+    ``verdict`` carries the usual prediction as soon as the label,
+    confidence, invasive and hunting_allowed fields have arrived,
+    ``details`` follows once the model's notes are complete, and
+    ``result`` closes the stream with the fully parsed prediction.
+    Cached images produce ``verdict`` and ``result`` immediately.
+
+    A cheaper tier whose verdict would be escalated is abandoned as soon
+    as the verdict is known, so only the answering tier's events are sent.
+
+    The cache lookup and image preparation run before this returns, so an
+    undecodable upload raises ``ImageRejected`` before any event is sent.
+    """
+    started = time.perf_counter()
+    record_id = record_id or uuid.uuid4().hex
+    cache = get_result_cache()
+    keys, lookup = CacheKeys(digest=image_digest(image_bytes)), CacheLookup(source="bypass")
+    if cache is not None:
+        with stage("cache_lookup"):
+            keys, lookup = await cache.lookup(image_bytes)
+        CACHE_LOOKUPS.inc(lookup.status)
+        if lookup.value is not None:
+            _persist(record_id, keys.digest, lookup.value, "stream", lookup.status, started)
+            return _cached_events(lookup.value)
+
+    image_bytes, mime_type, _ = await _prepare(image_bytes, mime_type)
+    return _stream_tiers(image_bytes, mime_type, record_id, keys, lookup, started)
+
+
+async def _cached_events(prediction: Dict[str, Any]) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    yield "verdict", _without_details(prediction)
+    if prediction.get("details"):
+        yield "details", {"details": prediction["details"]}
+    yield "result", prediction
+
+
+async def _stream_tiers(
+    image_bytes: bytes,
+    mime_type: str | None,
+    record_id: str,
+    keys: CacheKeys,
+    lookup: CacheLookup,
+    started: float,
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    cache = get_result_cache()
+    *cheaper, last = get_model_tiers()
+    for tier in (*cheaper, last):
+        parser = IncrementalObjectParser()
+        fields: Dict[str, Any] = {}
+        chunks: List[str] = []
+        verdict_sent = details_sent = False
+        reason: Optional[str] = None
+        request = _request_kwargs(
+            tier,
+            _single_image_content(image_bytes, mime_type, tier.image_detail),
+            tier.max_output_tokens,
+            schema=MODEL_OUTPUT_SCHEMA,
+        )
+        tier_started = time.perf_counter()
+        try:
+            async with aclosing(get_upstream().stream_response(**request)) as events:
+                async for event in events:
+                    if event.type == "response.output_text.delta":
+                        chunks.append(event.delta)
+                        fields.update(parser.feed(event.delta))
+                        if not verdict_sent and _verdict_ready(fields):
+                            try:
+                                verdict = _without_details(_normalize_prediction(fields))
+                            except (TypeError, ValueError) as exc:
+                                if tier is last:
+                                    raise InferenceError(
+                                        f"Failed to parse model response: {exc}", cause="parse"
+                                    ) from exc
+                                reason = "parse_error"
+                            else:
+                                reason = None if tier is last else _escalation_reason(verdict)
+                            if reason is not None:
+                                _record_abandoned(tier, chunks)
+                                break
+                            verdict_sent = True
+                            STAGE_SECONDS.observe(time.perf_counter() - started, "time_to_verdict")
+                            yield "verdict", {**verdict, "tier": tier.name}
+                        if verdict_sent and not details_sent and "details" in fields:
+                            details_sent = True
+                            if fields["details"]:
+                                yield "details", {"details": fields["details"]}
+                    elif event.type in ("response.completed", "response.incomplete"):
+                        _record_usage(event.response, tier)
+                    elif event.type in ("response.failed", "error"):
+                        raise InferenceError(f"OpenAI stream failed: {getattr(event, 'message', event.type)}")
+        except (UpstreamOverloaded, InferenceError):
+            raise
+        except Exception as exc:  # noqa: BLE001 - we want to wrap any client errors
+            logger.exception("OpenAI streaming request failed")
+            raise InferenceError(f"OpenAI request failed: {exc}") from exc
+        finally:
+            TIER_SECONDS.observe(time.perf_counter() - tier_started, tier.name)
+
+        if reason is None:
+            try:
+                prediction = parse_response("".join(chunks))
+            except InferenceError:
+                if tier is last:
+                    raise
+                reason = "parse_error"
+            else:
+                if not verdict_sent and tier is not last:
+                    reason = _escalation_reason(prediction)
+        if reason is not None:
+            _escalated(tier, reason)
+            continue
+
+        prediction = _answered(tier, prediction)
+        if not verdict_sent:
+            yield "verdict", _without_details(prediction)
+            if prediction["details"]:
+                yield "details", {"details": prediction["details"]}
+        if cache is not None:
+            await cache.set(keys, prediction)
+        _persist(record_id, keys.digest, prediction, "stream", lookup.status, started)
+        yield "result", prediction
+        return
+
+
+def _without_details(prediction: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in prediction.items() if key != "details"}
+
+
+def _persist(
+    record_id: str, digest: str, prediction: Dict[str, Any], source: str, cache_status: str, started: float
+) -> None:
+    tier = next((tier for tier in get_model_tiers() if tier.name == prediction.get("tier")), None)
+    record_classification(
+        record_id,
+        digest,
+        prediction,
+        model=tier.model if tier is not None else None,
+        source=source,
+        cache=cache_status,
+        duration=time.perf_counter() - started,
+    )
+
 
-    client = OpenAI(api_key=API_KEY)
-    image_base64 = base64.b64encode(image_bytes).decode("ascii")
+def _verdict_ready(fields: Dict[str, Any]) -> bool:
+    if fields.get("label") == "unknown":
+        return True
+    return all(name in fields for name in _VERDICT_FIELDS)
+
+
+async def _prepare(
+    image_bytes: bytes, mime_type: str | None
+) -> Tuple[bytes, str | None, Optional[PreprocessStats]]:
+    settings = get_settings()
+    if not settings.image_preprocess_enabled:
+        return image_bytes, mime_type, None
+    with stage("preprocess"):
+        prepared = await asyncio.to_thread(
+            prepare_image, image_bytes, settings.image_max_side, settings.image_jpeg_quality
+        )
+    return prepared.data, prepared.mime_type, prepared.stats
+
+
+async def _classify_uncached(
+    image_bytes: bytes, mime_type: str | None, batched: bool
+) -> Tuple[Dict[str, Any], Optional[PreprocessStats]]:
+    """Walk the model cascade until a tier gives an answer confident enough to keep.
+
+    Upstream failures are not escalated: a stronger tier would most likely
+    hit the same outage, so they propagate as they did before the cascade.
+    """
+    image_bytes, mime_type, stats = await _prepare(image_bytes, mime_type)
+    *cheaper, last = get_model_tiers()
+    for index, tier in enumerate(cheaper):
+        try:
+            prediction = await _call_tier(index, tier, image_bytes, mime_type, batched)
+        except InferenceError as exc:
+            if exc.cause != "parse":
+                raise
+            reason: Optional[str] = "parse_error"
+        else:
+            reason = _escalation_reason(prediction)
+            if reason is None:
+                return _answered(tier, prediction), stats
+        _escalated(tier, reason)
+
+    prediction = await _call_tier(len(cheaper), last, image_bytes, mime_type, batched)
+    return _answered(last, prediction), stats
+
+
+async def _call_tier(
+    index: int, tier: ModelTier, image_bytes: bytes, mime_type: str | None, batched: bool
+) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        if batched:
+            return await get_batcher(index).submit((image_bytes, mime_type))
+        return await _call_model(tier, image_bytes, mime_type)
+    finally:
+        TIER_SECONDS.observe(time.perf_counter() - started, tier.name)
+
+
+def _escalation_reason(prediction: Dict[str, Any]) -> Optional[str]:
+    """Return why a cheaper tier's answer should not be kept, or ``None`` to keep it."""
+    if lookup_species(prediction["species"]) is None:
+        return "unknown_species"
+    if prediction["score"] < get_settings().classification_confidence_threshold:
+        return "low_confidence"
+    return None
+
+
+def _answered(tier: ModelTier, prediction: Dict[str, Any]) -> Dict[str, Any]:
+    CASCADE_ANSWERS.inc(tier.name)
+    return {**prediction, "tier": tier.name}
+
+
+def _escalated(tier: ModelTier, reason: str) -> None:
+    CASCADE_ESCALATIONS.inc(tier.name, reason)
+    logger.info("Escalating classification to the next model tier", extra={"tier": tier.name, "reason": reason})
+
+
+def _image_content(image_bytes: bytes, mime_type: str | None, detail: str = "auto") -> Dict[str, Any]:
+    with stage("encode"):
+        image_base64 = base64.b64encode(image_bytes).decode("ascii")
+    PAYLOAD_BYTES.observe(len(image_base64), "upstream")
 
     data_uri_mime = mime_type or "image/png"
     image_data_uri = f"data:{data_uri_mime};base64,{image_base64}"
+    return {"type": "input_image", "image_url": image_data_uri, "detail": detail}
 
+
+def _single_image_content(image_bytes: bytes, mime_type: str | None, detail: str = "auto") -> List[Dict[str, Any]]:
+    return [
+        {"type": "input_text", "text": "Identify the species in this image."},
+        _image_content(image_bytes, mime_type, detail),
+    ]
+
+
+def _request_kwargs(
+    tier: ModelTier,
+    user_content: List[Dict[str, Any]],
+    max_output_tokens: int,
+    schema_name: str = "species_prediction",
+    schema: Dict[str, Any] = VERDICT_OUTPUT_SCHEMA,
+) -> Dict[str, Any]:
+    settings = get_settings()
     system_prompt = _SYSTEM_PROMPT.format(top_k=os.getenv("STRIKENET_TOP_K", 5))
 
+    kwargs: Dict[str, Any] = dict(
+        model=tier.model,
+        input=[
+            {
+                "role": "system",
+                "content": [
+                    {
+                        "type": "input_text",
+                        "text": system_prompt,
+                    }
+                ],
+            },
+            {
+                "role": "user",
+                "content": user_content,
+            },
+        ],
+        temperature=settings.openai_temperature,
+        max_output_tokens=max_output_tokens,
+    )
+    if settings.openai_structured_output:
+        kwargs["text"] = {
+            "format": {"type": "json_schema", "name": schema_name, "schema": schema, "strict": True}
+        }
+    return kwargs
+
+
+def _record_abandoned(tier: ModelTier, chunks: List[str]) -> None:
+    """Account for a tier stream dropped before ``response.completed`` reported its usage.
+
+    Output tokens are estimated at roughly four characters per token; the
+    input tokens are billed too but cannot be known, hence the counter.
+    """
+    CASCADE_ABANDONED.inc(tier.name)
+    UPSTREAM_TOKENS.inc("output_estimated", tier.name, amount=-(-sum(map(len, chunks)) // 4))
+
+
+def _record_usage(response: Any, tier: ModelTier) -> None:
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        UPSTREAM_TOKENS.inc("input", tier.name, amount=usage.input_tokens or 0)
+        UPSTREAM_TOKENS.inc("output", tier.name, amount=usage.output_tokens or 0)
+
+
+async def _create_response(
+    tier: ModelTier, user_content: List[Dict[str, Any]], max_output_tokens: int, **schema: Any
+) -> str:
+    """Run one Responses API call and return the model's output text."""
+
     try:
-        response = await asyncio.to_thread(
-            client.responses.create,
-            model=os.getenv("STRIKENET_OPENAI_MODEL", "gpt-4o-mini"),
-            input=[
-                {
-                    "role": "system",
-                    "content": [
-                        {
-                            "type": "input_text",
-                            "text": system_prompt,
-                        }
-                    ],
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "input_text", "text": "Identify the species in this image."},
-                        {"type": "input_image", "image_url": image_data_uri},
-                    ],
-                },
-            ],
-            temperature=0.0,
-            max_output_tokens=600,
+        response = await get_upstream().create_response(
+            **_request_kwargs(tier, user_content, max_output_tokens, **schema)
         )
+    except UpstreamOverloaded:
+        raise
     except Exception as exc:  # noqa: BLE001 - we want to wrap any client errors
         logger.exception("OpenAI request failed")
         raise InferenceError(f"OpenAI request failed: {exc}") from exc
 
-    # response = "```json\n{\n  \"label\": \"peacock\",\n \"confidence\": 0.95,\n  \"invasive\": false,\n  \"hunting_allowed\": false,\n  \"details\": {\n    \"scientific_name\": \"Pavo cristatus\",\n    \"description\": \"Peacocks are large, colorful birds known for their iridescent tail feathers, which they fan out during courtship displays. They are native to South Asia but have been introduced to various regions worldwide.\",\n    \"habitat\": \"Peacocks prefer open forests, grasslands, and areas near water.\",\n    \"behavior\": \"They are omnivorous, feeding on seeds, insects, and small animals.\"\n  }\n}\n```"
+    _record_usage(response, tier)
+    return response.output[0].content[0].text
+
+
+async def _call_model(tier: ModelTier, image_bytes: bytes, mime_type: str | None) -> Dict[str, Any]:
+    """Send the image to the tier's OpenAI vision-capable model."""
 
-    def parse_response(response: Any) -> any:
+    text = await _create_response(
+        tier, _single_image_content(image_bytes, mime_type, tier.image_detail), tier.max_output_tokens
+    )
+    return parse_response(text)
+
+
+async def _call_model_batch(
+    tier: ModelTier, images: List[Tuple[bytes, str | None]]
+) -> List[Union[Dict[str, Any], Exception]]:
+    """Classify several images with a single multi-image model request.
+
+    Images the combined answer does not cover, or covers with something
+    unparseable, are retried with a request of their own, so one bad entry
+    never fails its neighbours.
+    """
+
+    if len(images) == 1:
         try:
-            parsed_response = json.loads(response.split("```json")[-1].split("```")[0].strip())
-            
-            species = parsed_response.get("label", "unknown")
+            return [await _call_model(tier, *images[0])]
+        except InferenceError as exc:
+            return [exc]
+
+    content: List[Dict[str, Any]] = [
+        {"type": "input_text", "text": _BATCH_INSTRUCTIONS.format(count=len(images))}
+    ]
+    content.extend(_image_content(image_bytes, mime_type, tier.image_detail) for image_bytes, mime_type in images)
+    text = await _create_response(
+        tier,
+        content,
+        tier.max_output_tokens * len(images),
+        schema_name="species_predictions",
+        schema=BATCH_MODEL_OUTPUT_SCHEMA,
+    )
 
-            if species == "unknown":
-                return {"species": "unknown", "score": 0.0, "invasive": False, "hunting_allowed": False}
-            score = float(parsed_response.get("confidence", 0.0))
-            invasive = bool(parsed_response.get("invasive", False))
-            hunting_allowed = bool(parsed_response.get("hunting_allowed", False))
+    try:
+        results = parse_batch_response(text, len(images))
+    except InferenceError as exc:
+        results = [exc] * len(images)
 
-            # details = parsed_response.get("details", {})
-            return {"species": species,
-                    "score": score,
-                    "invasive": invasive,
-                    "hunting_allowed": hunting_allowed}
-                    # --"details": parsed_response["details"]}
+    missing = [index for index, result in enumerate(results) if isinstance(result, Exception)]
+    if missing:
+        logger.warning("Retrying images missing from batched answer", extra={"count": len(missing)})
+        retried = await asyncio.gather(*(_call_model(tier, *images[index]) for index in missing), return_exceptions=True)
+        for index, result in zip(missing, retried):
+            results[index] = result
+    return results
 
-        except (KeyError, json.JSONDecodeError) as exc:
-            logger.exception("Failed to parse model response")
-            raise InferenceError(f"Failed to parse model response: {exc}") from exc
 
-    return parse_response(response.output[0].content[0].text)
+# response = "```json\n{\n  \"label\": \"peacock\",\n \"confidence\": 0.95,\n  \"invasive\": false,\n  \"hunting_allowed\": false,\n  \"details\": {\n    \"scientific_name\": \"Pavo cristatus\",\n    \"description\": \"Peacocks are large, colorful birds known for their iridescent tail feathers, which they fan out during courtship displays. They are native to South Asia but have been introduced to various regions worldwide.\",\n    \"habitat\": \"Peacocks prefer open forests, grasslands, and areas near water.\",\n    \"behavior\": \"They are omnivorous, feeding on seeds, insects, and small animals.\"\n  }\n}\n```"
 
+def _extract_json(response: str) -> Any:
+    return json.loads(response.split("```json")[-1].split("```")[0].strip())
 
+
+def _normalize_prediction(parsed_response: Dict[str, Any]) -> Dict[str, Any]:
+    species = parsed_response.get("label", "unknown")
+    # Only the streaming path asks for details; elsewhere it is None.
+    details = parsed_response.get("details")
+    details = details if isinstance(details, str) else None
+
+    if species == "unknown":
+        return {"species": "unknown", "score": 0.0, "invasive": False, "hunting_allowed": False, "details": details}
+    score = float(parsed_response.get("confidence", 0.0))
+    invasive = bool(parsed_response.get("invasive", False))
+    hunting_allowed = bool(parsed_response.get("hunting_allowed", False))
+
+    return {"species": species,
+            "score": score,
+            "invasive": invasive,
+            "hunting_allowed": hunting_allowed,
+            "details": details}
+
+
+def parse_response(response: str) -> Dict[str, Any]:
+    """Parse a single-image answer.
+
+    An answer cut off by the output token limit after the verdict fields
+    (typically in ``details``) still yields its verdict.
+    """
+    try:
+        with stage("parse"):
+            return _normalize_prediction(_extract_json(response))
+    except (KeyError, TypeError, ValueError, AttributeError) as exc:
+        error: Exception = exc
+        parser = IncrementalObjectParser()
+        fields = dict(parser.feed(response))
+        # A complete object that failed above is malformed, not truncated.
+        if not parser.complete and _verdict_ready(fields):
+            try:
+                prediction = _normalize_prediction(fields)
+            except (TypeError, ValueError) as fallback_exc:
+                error = fallback_exc
+            else:
+                logger.warning("Using verdict from truncated model response")
+                return prediction
+        logger.exception("Failed to parse model response")
+        raise InferenceError(f"Failed to parse model response: {error}", cause="parse") from error
+
+
+def parse_batch_response(response: str, count: int) -> List[Union[Dict[str, Any], Exception]]:
+    """Map a multi-image answer back to its images by ``index``."""
+    try:
+        parsed_response = _extract_json(response)
+    except ValueError as exc:
+        logger.exception("Failed to parse batched model response")
+        raise InferenceError(f"Failed to parse model response: {exc}", cause="parse") from exc
+    if isinstance(parsed_response, dict):
+        parsed_response = parsed_response.get("predictions")
+    if not isinstance(parsed_response, list):
+        raise InferenceError("Batched model response is not a list of predictions.", cause="parse")
+
+    results: List[Union[Dict[str, Any], Exception]] = [
+        InferenceError(f"Model returned no prediction for image {index}.", cause="parse") for index in range(count)
+    ]
+    for position, entry in enumerate(parsed_response):
+        if not isinstance(entry, dict):
+            continue
+        index = entry.get("index", position)
+        if not isinstance(index, int) or not 0 <= index < count:
+            continue
+        try:
+            results[index] = _normalize_prediction(entry)
+        except (TypeError, ValueError) as exc:
+            results[index] = InferenceError(f"Failed to parse model response: {exc}", cause="parse")
+    return results
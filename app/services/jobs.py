@@ -0,0 +1,341 @@
+"""Durable SQLite-backed job queue and worker pool for asynchronous classification."""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from app.config import Settings, get_settings
+from app.services.inference import InferenceError, classify_image
+from app.services.preprocessing import ImageRejected
+from app.services.upstream import UpstreamOverloaded
+
+logger = logging.getLogger("strikenet.jobs")
+logger.setLevel(logging.INFO)
+
+# Lower values are claimed first.
+PRIORITY_LANES: Dict[str, int] = {"interactive": 0, "bulk": 1}
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+
+class QueueFull(RuntimeError):
+    """Raised when too many jobs are already waiting; callers should answer 503."""
+
+    def __init__(self, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class ClaimedJob:
+    id: str
+    image: bytes
+    mime_type: str
+    attempts: int
+
+
+class JobStore:
+    """Job table shared by every worker process pointing at the same SQLite file.
+
+    Claimed jobs carry a lease that the worker renews while it runs; a job
+    whose worker died is handed out again once the lease expires, so queued
+    and in-progress work survives restarts.
+    """
+
+    def __init__(self, path: str, lease_seconds: float, max_attempts: int) -> None:
+        self._path = path
+        self._lease_seconds = lease_seconds
+        self._max_attempts = max_attempts
+        self._local = threading.local()
+        self._connect().executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " priority INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " available_at REAL NOT NULL,"
+            " lease_expires_at REAL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " image BLOB,"
+            " mime_type TEXT,"
+            " result TEXT,"
+            " error TEXT,"
+            " error_status INTEGER);"
+            "CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority, created_at);"
+            "CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs (updated_at);"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=10.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def pending_count(self) -> int:
+        row = self._connect().execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()
+        return row[0]
+
+    def enqueue(self, image: bytes, mime_type: str, priority: int) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO jobs (id, status, priority, created_at, updated_at, available_at, image, mime_type)"
+            " VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)",
+            (job_id, priority, now, now, now, image, mime_type),
+        )
+        return job_id
+
+    def claim(self) -> Optional[ClaimedJob]:
+        """Atomically lease the highest-priority runnable job, if any."""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Jobs whose lease expired too many times are given up on rather than retried forever.
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Job exceeded its retry limit.', error_status = 500,"
+                " image = NULL, updated_at = ?"
+                " WHERE status = 'running' AND lease_expires_at < ? AND attempts >= ?",
+                (now, now, self._max_attempts),
+            )
+            row = conn.execute(
+                "SELECT id, image, mime_type, attempts FROM jobs"
+                " WHERE (status = 'queued' AND available_at <= ?)"
+                " OR (status = 'running' AND lease_expires_at < ?)"
+                " ORDER BY priority, created_at LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_expires_at = ?, updated_at = ?"
+                " WHERE id = ?",
+                (now + self._lease_seconds, now, row["id"]),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return ClaimedJob(id=row["id"], image=row["image"], mime_type=row["mime_type"], attempts=row["attempts"] + 1)
+
+    # ``complete``, ``fail``, ``release`` and ``renew`` only touch a job while the caller still holds
+    # its lease: once it expires and another worker claims the job, ``attempts`` no longer matches
+    # and they return ``False`` instead of overwriting the newer claim.
+
+    def complete(self, job: ClaimedJob, result: Dict[str, Any]) -> bool:
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = 'succeeded', result = ?, image = NULL, lease_expires_at = NULL,"
+            " updated_at = ? WHERE id = ? AND status = 'running' AND attempts = ?",
+            (json.dumps(result), time.time(), job.id, job.attempts),
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job: ClaimedJob, error_status: int, error: str) -> bool:
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = 'failed', error = ?, error_status = ?, image = NULL,"
+            " lease_expires_at = NULL, updated_at = ? WHERE id = ? AND status = 'running' AND attempts = ?",
+            (error, error_status, time.time(), job.id, job.attempts),
+        )
+        return cursor.rowcount == 1
+
+    def release(self, job: ClaimedJob, delay: float = 0.0, refund_attempt: bool = False) -> bool:
+        """Put a claimed job back in the queue, optionally after ``delay`` seconds."""
+        now = time.time()
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = 'queued', lease_expires_at = NULL, available_at = ?, updated_at = ?,"
+            " attempts = attempts - ? WHERE id = ? AND status = 'running' AND attempts = ?",
+            (now + delay, now, int(refund_attempt), job.id, job.attempts),
+        )
+        return cursor.rowcount == 1
+
+    def renew(self, job: ClaimedJob) -> bool:
+        """Extend the lease of a job that is still being worked on."""
+        now = time.time()
+        cursor = self._connect().execute(
+            "UPDATE jobs SET lease_expires_at = ?, updated_at = ?"
+            " WHERE id = ? AND status = 'running' AND attempts = ?",
+            (now + self._lease_seconds, now, job.id, job.attempts),
+        )
+        return cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            "SELECT id, status, priority, created_at, updated_at, attempts, result, error, error_status"
+            " FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        lane = next(name for name, value in PRIORITY_LANES.items() if value == row["priority"])
+        job: Dict[str, Any] = {
+            "job_id": row["id"],
+            "status": row["status"],
+            "priority": lane,
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "attempts": row["attempts"],
+        }
+        if row["result"] is not None:
+            job["result"] = json.loads(row["result"])
+        if row["error"] is not None:
+            job["error"] = {"status": row["error_status"], "detail": row["error"]}
+        return job
+
+    def purge(self, older_than: float) -> int:
+        cursor = self._connect().execute(
+            "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?",
+            (older_than,),
+        )
+        return cursor.rowcount
+
+
+class JobWorkerPool:
+    """Fixed number of asyncio workers draining the job store."""
+
+    def __init__(self, store: JobStore, settings: Settings) -> None:
+        self._store = store
+        self._workers = settings.job_workers
+        self._poll_interval = settings.job_poll_interval_seconds
+        self._max_pending = settings.job_max_pending
+        self._max_attempts = settings.job_max_attempts
+        self._retention = settings.job_retention_seconds
+        # Renew well before expiry so one slow or failed renewal does not lose the lease.
+        self._heartbeat_interval = settings.job_lease_seconds / 3
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def submit(self, image: bytes, mime_type: str, priority: int) -> str:
+        if await asyncio.to_thread(self._store.pending_count) >= self._max_pending:
+            raise QueueFull("Job queue is full.", max(1, round(self._poll_interval * 5)))
+        job_id = await asyncio.to_thread(self._store.enqueue, image, mime_type, priority)
+        self._wakeup.set()
+        logger.info("Queued classification job", extra={"job_id": job_id, "priority": priority})
+        return job_id
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._run(index)) for index in range(self._workers)]
+        self._tasks.append(asyncio.create_task(self._purge_finished()))
+        for task in self._tasks:
+            task.add_done_callback(self._log_exit)
+        logger.info("Started job workers", extra={"workers": self._workers})
+
+    @staticmethod
+    def _log_exit(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Job worker exited unexpectedly", exc_info=task.exception())
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, index: int) -> None:
+        while True:
+            try:
+                job = await asyncio.to_thread(self._store.claim)
+            except sqlite3.Error:
+                # e.g. "database is locked" when several processes share the file; try again shortly.
+                logger.exception("Failed to claim a job", extra={"worker": index})
+                await asyncio.sleep(self._poll_interval)
+                continue
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self._poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heartbeat = asyncio.create_task(self._keep_leased(job))
+            try:
+                await self._process(job)
+            except asyncio.CancelledError:
+                # Hand the job straight back instead of waiting for its lease to expire.
+                try:
+                    await asyncio.shield(asyncio.to_thread(self._store.release, job, 0.0, True))
+                except sqlite3.Error:
+                    logger.exception("Failed to release job; it is reclaimed once its lease expires")
+                raise
+            except sqlite3.Error:
+                # The classification may well have succeeded; the lease brings the job back for another try.
+                logger.exception("Failed to record job outcome", extra={"job_id": job.id})
+                await asyncio.sleep(self._poll_interval)
+            except Exception:  # noqa: BLE001 - a broken job must not kill the worker
+                logger.exception("Job worker crashed while processing job", extra={"job_id": job.id})
+                try:
+                    await asyncio.to_thread(self._store.fail, job, 500, "Unexpected error while processing job.")
+                except sqlite3.Error:
+                    logger.exception("Failed to record job failure", extra={"job_id": job.id})
+                    await asyncio.sleep(self._poll_interval)
+            finally:
+                heartbeat.cancel()
+
+    async def _keep_leased(self, job: ClaimedJob) -> None:
+        while True:
+            await asyncio.sleep(self._heartbeat_interval)
+            try:
+                renewed = await asyncio.to_thread(self._store.renew, job)
+            except sqlite3.Error:
+                logger.exception("Failed to renew job lease", extra={"job_id": job.id})
+                continue
+            if not renewed:
+                logger.warning("Lost the lease on a running job", extra={"job_id": job.id})
+                return
+
+    async def _process(self, job: ClaimedJob) -> None:
+        try:
+            result = await classify_image(job.image, job.mime_type, source="job", record_id=job.id)
+        except ImageRejected as exc:
+            recorded = await asyncio.to_thread(self._store.fail, job, exc.status_code, str(exc))
+        except UpstreamOverloaded as exc:
+            recorded = await asyncio.to_thread(self._store.release, job, exc.retry_after, True)
+        except InferenceError as exc:
+            if job.attempts >= self._max_attempts:
+                recorded = await asyncio.to_thread(self._store.fail, job, 502, str(exc))
+            else:
+                recorded = await asyncio.to_thread(self._store.release, job, 2.0 ** job.attempts)
+        else:
+            recorded = await asyncio.to_thread(self._store.complete, job, result.prediction)
+            if recorded:
+                logger.info("Completed classification job", extra={"job_id": job.id})
+        if not recorded:
+            logger.warning("Discarding job outcome; another worker holds the job now", extra={"job_id": job.id})
+
+    async def _purge_finished(self) -> None:
+        while True:
+            await asyncio.sleep(max(60.0, self._retention / 10))
+            try:
+                removed = await asyncio.to_thread(self._store.purge, time.time() - self._retention)
+            except sqlite3.Error:
+                logger.exception("Failed to purge finished jobs")
+                continue
+            if removed:
+                logger.info("Purged finished jobs", extra={"count": removed})
+
+
+@lru_cache()
+def get_job_store() -> JobStore:
+    settings = get_settings()
+    return JobStore(settings.job_db_path, settings.job_lease_seconds, settings.job_max_attempts)
+
+
+@lru_cache()
+def get_job_pool() -> JobWorkerPool:
+    return JobWorkerPool(get_job_store(), get_settings())
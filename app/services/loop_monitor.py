@@ -0,0 +1,80 @@
+"""Event-loop lag sampling, used to spot blocking work on the request path."""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import logging
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from app.config import get_settings
+from app.services.metrics import REGISTRY, Histogram
+
+logger = logging.getLogger("strikenet.loop_monitor")
+logger.setLevel(logging.INFO)
+
+# Upper bounds in milliseconds; samples above the last bound land in +Inf.
+LAG_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+EVENT_LOOP_LAG = REGISTRY.register(Histogram(
+    "strikenet_event_loop_lag_seconds",
+    "How late the event loop woke up the lag monitor.",
+    buckets=[bound / 1000 for bound in LAG_BUCKETS_MS],
+))
+
+
+class LoopLagMonitor:
+    """Sleeps for a fixed interval and records how late the loop woke it up.
+
+    Totals are cumulative, Prometheus-style, so callers can diff two
+    snapshots to get the lag distribution over any period.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self._interval = interval
+        self._counts: List[int] = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self._sum_ms = 0.0
+        self._max_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def record(self, lag_ms: float) -> None:
+        self._counts[bisect.bisect_left(LAG_BUCKETS_MS, lag_ms)] += 1
+        self._sum_ms += lag_ms
+        self._max_ms = max(self._max_ms, lag_ms)
+        EVENT_LOOP_LAG.observe(lag_ms / 1000)
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self._interval)
+            self.record(max(0.0, (time.perf_counter() - started - self._interval) * 1000))
+
+    def stats(self) -> Dict[str, Any]:
+        cumulative: Dict[str, int] = {}
+        running = 0
+        for bound, count in zip((*map(str, LAG_BUCKETS_MS), "+Inf"), self._counts):
+            running += count
+            cumulative[bound] = running
+        return {
+            "interval_ms": self._interval * 1000,
+            "count": running,
+            "sum_ms": round(self._sum_ms, 3),
+            "max_ms": round(self._max_ms, 3),
+            "buckets_ms": cumulative,
+        }
+
+
+@lru_cache()
+def get_loop_monitor() -> LoopLagMonitor:
+    return LoopLagMonitor(get_settings().loop_lag_interval_seconds)
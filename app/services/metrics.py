@@ -0,0 +1,254 @@
+"""Low-overhead in-process metrics rendered in the Prometheus text format."""
+from __future__ import annotations
+
+import bisect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+# Default latency buckets in seconds, spanning cache hits to slow model calls.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (1024, 10240, 102400, 262144, 524288, 1048576, 2097152, 5242880, 10485760, 20971520)
+
+LabelValues = Tuple[str, ...]
+M = TypeVar("M", bound="_Metric")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def set_total(self, value: float, *labels: str) -> None:
+        """Mirror a cumulative count kept by another component."""
+        self._values[labels] = value
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+            for labels, value in self._values.items()
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+            for labels, value in self._values.items()
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> None:
+        super().__init__(name, help_text, labels)
+        self._buckets = tuple(buckets)
+        # Per label set: per-bucket (non-cumulative) counts with a trailing +Inf slot, then sum.
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = ([0] * (len(self._buckets) + 1), [0.0])
+        series[0][bisect.bisect_left(self._buckets, value)] += 1
+        series[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        bounds = [_format_value(bound) for bound in self._buckets] + ["+Inf"]
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                bucket_labels = _format_labels(self.label_names, labels, 'le="' + bound + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: M) -> M:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Run ``collector`` before every scrape, e.g. to copy gauges from other components."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "strikenet_stage_duration_seconds", "Time spent in each stage of a classification.", ["stage"]
+))
+PAYLOAD_BYTES = REGISTRY.register(Histogram(
+    "strikenet_payload_bytes", "Size of uploaded and upstream image payloads.", ["kind"], BYTES_BUCKETS
+))
+UPSTREAM_TOKENS = REGISTRY.register(Counter(
+    "strikenet_upstream_tokens_total", "Tokens reported by the upstream model, by model tier.", ["kind", "tier"]
+))
+UPSTREAM_CALLS = REGISTRY.register(Counter(
+    "strikenet_upstream_calls_total", "Upstream model calls by outcome.", ["outcome"]
+))
+ERRORS = REGISTRY.register(Counter(
+    "strikenet_errors_total", "Rejected or failed classifications by error class.", ["error_class", "cause"]
+))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "strikenet_cache_lookups_total", "Result cache lookups by status.", ["status"]
+))
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "strikenet_http_requests_total", "HTTP requests by method and status code.", ["method", "status"]
+))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "strikenet_http_in_flight_requests", "HTTP requests currently being served."
+))
+UPSTREAM_IN_FLIGHT = REGISTRY.register(Gauge(
+    "strikenet_upstream_in_flight_calls", "Upstream model calls currently holding a slot."
+))
+UPSTREAM_WAITING = REGISTRY.register(Gauge(
+    "strikenet_upstream_waiting_calls", "Upstream model calls waiting for a slot."
+))
+TIER_SECONDS = REGISTRY.register(Histogram(
+    "strikenet_tier_duration_seconds", "Time spent asking each model tier of the cascade.", ["tier"]
+))
+CASCADE_ANSWERS = REGISTRY.register(Counter(
+    "strikenet_cascade_answers_total", "Classifications by the model tier that answered.", ["tier"]
+))
+CASCADE_ESCALATIONS = REGISTRY.register(Counter(
+    "strikenet_cascade_escalations_total", "Answers handed to the next model tier, by reason.", ["tier", "reason"]
+))
+CASCADE_ABANDONED = REGISTRY.register(Counter(
+    "strikenet_cascade_abandoned_streams_total",
+    "Streamed tier answers dropped on escalation before the model reported usage.",
+    ["tier"],
+))
+COALESCING = REGISTRY.register(Counter(
+    "strikenet_coalescing_total", "Single-flight outcomes for cache misses.", ["outcome"]
+))
+
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("strikenet_request_timings", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block into the stage histogram and the current request's Server-Timing header."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def record_error(error_class: str, cause: str) -> None:
+    ERRORS.inc(error_class, cause)
+
+
+def server_timing_header(timings: List[Tuple[str, float]], total: float) -> str:
+    entries = [f"{name};dur={elapsed * 1000:.2f}" for name, elapsed in timings]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting HTTP requests and adding a ``Server-Timing`` header.
+
+    Written against raw ASGI rather than ``BaseHTTPMiddleware`` so streaming
+    responses pass through untouched and the per-request cost stays small.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: List[Tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                header = server_timing_header(timings, time.perf_counter() - started)
+                message["headers"] = [*message.get("headers", []), (b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            HTTP_REQUESTS.inc(scope["method"], str(status_code))
+            _request_timings.reset(token)
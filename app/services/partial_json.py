@@ -0,0 +1,76 @@
+"""Incremental parsing of a streamed JSON object, one completed top-level field at a time."""
+from __future__ import annotations
+
+import json
+from typing import Any, List, Optional, Tuple
+
+_DECODER = json.JSONDecoder()
+
+
+class IncrementalObjectParser:
+    """Feed text chunks of a JSON object; get back each top-level field as soon as it is complete.
+
+    Only one pass is made over the text, so feeding a long stream of small
+    deltas stays linear. Text before the opening brace (for example a
+    Markdown fence) is ignored.
+    """
+
+    def __init__(self) -> None:
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._field_start: Optional[int] = None
+        self.complete = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        self._text += chunk
+        fields: List[Tuple[str, Any]] = []
+        text = self._text
+        for index in range(self._pos, len(text)):
+            char = text[index]
+            if self.complete:
+                break
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                if self._depth > 0:
+                    self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._field_start = index + 1
+            elif char in "}]":
+                if self._depth == 1:
+                    self._emit(self._field_start, index, fields)
+                    self.complete = True
+                self._depth -= 1
+            elif char == "," and self._depth == 1:
+                self._emit(self._field_start, index, fields)
+                self._field_start = index + 1
+        self._pos = len(text)
+        return fields
+
+    def _emit(self, start: Optional[int], end: int, fields: List[Tuple[str, Any]]) -> None:
+        if start is None:
+            return
+        segment = self._text[start:end].strip()
+        if not segment:
+            return
+        try:
+            key, offset = _DECODER.raw_decode(segment)
+            _, colon, value_text = segment[offset:].partition(":")
+            if not colon or not isinstance(key, str):
+                return
+            fields.append((key, json.loads(value_text)))
+        except ValueError:
+            # Malformed fields are left for the final full parse to report.
+            return
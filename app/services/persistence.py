@@ -0,0 +1,335 @@
+"""Write-behind persistence of classifications and user feedback for auditing and retraining."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from app.config import get_settings
+from app.services.metrics import REGISTRY, Counter, Gauge, stage
+
+logger = logging.getLogger("strikenet.persistence")
+logger.setLevel(logging.INFO)
+
+PERSISTED_RECORDS = REGISTRY.register(Counter(
+    "strikenet_persisted_records_total", "Classification and feedback records by write-behind outcome.", ["outcome"]
+))
+PERSISTENCE_PENDING = REGISTRY.register(Gauge(
+    "strikenet_persistence_pending_records", "Records buffered in memory waiting to be written."
+))
+
+
+@dataclass(frozen=True)
+class ClassificationRecord:
+    id: str
+    created_at: float
+    digest: str
+    species: str
+    score: float
+    invasive: bool
+    hunting_allowed: bool
+    tier: Optional[str]
+    model: Optional[str]
+    source: str
+    cache: str
+    duration_ms: float
+    threshold: float
+    decision: str
+
+
+@dataclass(frozen=True)
+class FeedbackRecord:
+    classification_id: str
+    created_at: float
+    correct: bool
+    species: Optional[str]
+    comment: Optional[str]
+
+
+Record = Union[ClassificationRecord, FeedbackRecord]
+
+
+def threshold_decision(score: float, threshold: float) -> str:
+    """``accepted`` when the score reaches the threshold, otherwise ``review`` for a human to check."""
+    return "accepted" if score >= threshold else "review"
+
+
+class ResultStore:
+    """Append-mostly SQLite tables of classifications and feedback.
+
+    Writes arrive in batches from ``WriteBehindBuffer`` and run in a single
+    transaction; the indexes cover the recent, review-queue and per-species
+    queries so none of them scans the whole table.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._local = threading.local()
+        self._connect().executescript(
+            "CREATE TABLE IF NOT EXISTS classifications ("
+            " id TEXT PRIMARY KEY,"
+            " created_at REAL NOT NULL,"
+            " digest TEXT NOT NULL,"
+            " species TEXT NOT NULL,"
+            " score REAL NOT NULL,"
+            " invasive INTEGER NOT NULL,"
+            " hunting_allowed INTEGER NOT NULL,"
+            " tier TEXT,"
+            " model TEXT,"
+            " source TEXT NOT NULL,"
+            " cache TEXT NOT NULL,"
+            " duration_ms REAL NOT NULL,"
+            " threshold REAL NOT NULL,"
+            " decision TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS classifications_created_at ON classifications (created_at);"
+            "CREATE INDEX IF NOT EXISTS classifications_species ON classifications (species, created_at);"
+            "CREATE INDEX IF NOT EXISTS classifications_review ON classifications (created_at)"
+            " WHERE decision = 'review';"
+            "CREATE INDEX IF NOT EXISTS classifications_digest ON classifications (digest);"
+            "CREATE TABLE IF NOT EXISTS feedback ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " classification_id TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " correct INTEGER NOT NULL,"
+            " species TEXT,"
+            " comment TEXT);"
+            "CREATE INDEX IF NOT EXISTS feedback_classification ON feedback (classification_id);"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=10.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def write(self, records: Sequence[Record]) -> None:
+        classifications = [record for record in records if isinstance(record, ClassificationRecord)]
+        feedback = [record for record in records if isinstance(record, FeedbackRecord)]
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO classifications (id, created_at, digest, species, score, invasive,"
+                " hunting_allowed, tier, model, source, cache, duration_ms, threshold, decision)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        record.id, record.created_at, record.digest, record.species, record.score,
+                        int(record.invasive), int(record.hunting_allowed), record.tier, record.model,
+                        record.source, record.cache, record.duration_ms, record.threshold, record.decision,
+                    )
+                    for record in classifications
+                ],
+            )
+            conn.executemany(
+                "INSERT INTO feedback (classification_id, created_at, correct, species, comment)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [
+                    (record.classification_id, record.created_at, int(record.correct), record.species, record.comment)
+                    for record in feedback
+                ],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def exists(self, classification_id: str) -> bool:
+        row = self._connect().execute(
+            "SELECT 1 FROM classifications WHERE id = ?", (classification_id,)
+        ).fetchone()
+        return row is not None
+
+    def recent(self, limit: int, species: Optional[str] = None, before: Optional[float] = None) -> List[Dict[str, Any]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        if species is not None:
+            clauses.append("species = ?")
+            params.append(species)
+        if before is not None:
+            clauses.append("created_at < ?")
+            params.append(before)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._select(f"{where} ORDER BY created_at DESC LIMIT ?", [*params, limit])
+
+    def review_queue(self, limit: int, before: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Low-confidence classifications, newest first, that nobody has given feedback on yet."""
+        params: List[Any] = []
+        where = " WHERE decision = 'review'"
+        if before is not None:
+            where += " AND created_at < ?"
+            params.append(before)
+        where += " AND NOT EXISTS (SELECT 1 FROM feedback WHERE feedback.classification_id = classifications.id)"
+        return self._select(f"{where} ORDER BY created_at DESC LIMIT ?", [*params, limit])
+
+    def species_counts(self, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        where, params = ("", []) if since is None else (" WHERE created_at >= ?", [since])
+        rows = self._connect().execute(
+            "SELECT species, COUNT(*) AS count, SUM(decision = 'review') AS review, AVG(score) AS mean_score"
+            f" FROM classifications{where} GROUP BY species ORDER BY count DESC",
+            params,
+        ).fetchall()
+        return [
+            {"species": row["species"], "count": row["count"], "review": row["review"],
+             "mean_score": round(row["mean_score"], 4)}
+            for row in rows
+        ]
+
+    def _select(self, clause: str, params: Sequence[Any]) -> List[Dict[str, Any]]:
+        rows = self._connect().execute(f"SELECT * FROM classifications{clause}", params).fetchall()
+        return [
+            {**dict(row), "invasive": bool(row["invasive"]), "hunting_allowed": bool(row["hunting_allowed"])}
+            for row in rows
+        ]
+
+
+class WriteBehindBuffer:
+    """Collects records in memory and writes them to a ``ResultStore`` in batches.
+
+    ``add`` never blocks the request path. A flush runs once ``batch_size``
+    records are waiting or ``flush_interval`` seconds have passed, whichever
+    comes first. At most ``max_pending`` records are held; beyond that new
+    records are dropped and counted rather than letting memory grow while
+    the database is slow. ``stop`` writes out whatever is still buffered.
+    """
+
+    def __init__(self, store: ResultStore, *, batch_size: int, flush_interval: float, max_pending: int) -> None:
+        self._store = store
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._pending: List[Record] = []
+        self._writing: Sequence[Record] = ()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def store(self) -> ResultStore:
+        return self._store
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def has_classification(self, classification_id: str) -> bool:
+        """Whether the classification is buffered, being written, or already stored."""
+        # Checked before the store: a record leaves ``_writing`` only once its batch is committed.
+        for record in (*self._pending, *self._writing):
+            if isinstance(record, ClassificationRecord) and record.id == classification_id:
+                return True
+        return await asyncio.to_thread(self._store.exists, classification_id)
+
+    def add(self, record: Record) -> bool:
+        if len(self._pending) >= self._max_pending:
+            PERSISTED_RECORDS.inc("dropped")
+            logger.warning("Dropping record; write-behind buffer is full", extra={"pending": len(self._pending)})
+            return False
+        self._pending.append(record)
+        if len(self._pending) >= self._batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while self._pending:
+            if not await self.flush():
+                PERSISTED_RECORDS.inc("dropped", amount=len(self._pending))
+                logger.error("Discarding unwritten records at shutdown", extra={"count": len(self._pending)})
+                self._pending.clear()
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._pending:
+                if not await self.flush() or len(self._pending) < self._batch_size:
+                    break
+
+    async def flush(self) -> bool:
+        """Write up to one batch; returns ``False`` (keeping the records) when the write failed."""
+        batch = self._pending[:self._batch_size]
+        if not batch:
+            return True
+        # Detach before the write so records added meanwhile are not lost or written twice.
+        del self._pending[:len(batch)]
+        self._writing = batch
+        try:
+            with stage("persist"):
+                await asyncio.to_thread(self._store.write, batch)
+        except Exception:  # noqa: BLE001 - retried on the next flush
+            logger.exception("Failed to write records; will retry", extra={"count": len(batch)})
+            self._pending[:0] = batch
+            return False
+        finally:
+            self._writing = ()
+        PERSISTED_RECORDS.inc("written", amount=len(batch))
+        return True
+
+
+@lru_cache()
+def get_result_log() -> Optional[WriteBehindBuffer]:
+    """Return the process-wide write-behind buffer, or ``None`` when persistence is disabled."""
+    settings = get_settings()
+    if not settings.persistence_enabled:
+        return None
+    return WriteBehindBuffer(
+        ResultStore(settings.persistence_db_path),
+        batch_size=settings.persistence_batch_size,
+        flush_interval=settings.persistence_flush_interval_seconds,
+        max_pending=settings.persistence_max_pending,
+    )
+
+
+def record_classification(
+    record_id: str,
+    digest: str,
+    prediction: Dict[str, Any],
+    *,
+    model: Optional[str],
+    source: str,
+    cache: str,
+    duration: float,
+) -> None:
+    """Queue a classification for persistence; a no-op when persistence is disabled."""
+    log = get_result_log()
+    if log is None:
+        return
+    threshold = get_settings().classification_confidence_threshold
+    score = float(prediction.get("score", 0.0))
+    log.add(ClassificationRecord(
+        id=record_id,
+        created_at=time.time(),
+        digest=digest,
+        species=prediction.get("species", "unknown"),
+        score=score,
+        invasive=bool(prediction.get("invasive", False)),
+        hunting_allowed=bool(prediction.get("hunting_allowed", False)),
+        tier=prediction.get("tier"),
+        model=model,
+        source=source,
+        cache=cache,
+        duration_ms=round(duration * 1000, 3),
+        threshold=threshold,
+        decision=threshold_decision(score, threshold),
+    ))
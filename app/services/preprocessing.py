@@ -0,0 +1,176 @@
+"""Bounded upload reading and image normalisation before images are sent upstream."""
+from __future__ import annotations
+
+import io
+import logging
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from fastapi import UploadFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger("strikenet.preprocessing")
+logger.setLevel(logging.INFO)
+
+# (offset, signature, mime type) for the formats Pillow can decode without plugins.
+_MAGIC_NUMBERS: Tuple[Tuple[int, bytes, str], ...] = (
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (8, b"WEBP", "image/webp"),
+    (0, b"BM", "image/bmp"),
+    (0, b"II*\x00", "image/tiff"),
+    (0, b"MM\x00*", "image/tiff"),
+)
+
+# Formats the model accepts as-is, used when re-encoding would not shrink the upload.
+_PASSTHROUGH_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+# JPEG segments carrying metadata only: APP1 (EXIF, XMP) and APP13 (IPTC).
+_JPEG_METADATA_MARKERS = frozenset((0xE1, 0xED))
+
+_EXIF_ORIENTATION = 0x0112
+
+
+class ImageRejected(ValueError):
+    """Raised when an upload cannot be accepted for classification."""
+
+    status_code = 400
+
+
+class UploadTooLarge(ImageRejected):
+    status_code = 413
+
+
+class UnsupportedImage(ImageRejected):
+    status_code = 415
+
+
+@dataclass(frozen=True)
+class PreprocessStats:
+    original_bytes: int
+    sent_bytes: int
+    original_size: Tuple[int, int]
+    sent_size: Tuple[int, int]
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.sent_bytes
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    stats: PreprocessStats
+
+
+def sniff_mime_type(head: bytes) -> Optional[str]:
+    """Return the image mime type implied by the leading bytes, if recognised."""
+    for offset, signature, mime_type in _MAGIC_NUMBERS:
+        if head[offset:offset + len(signature)] == signature:
+            if mime_type == "image/webp" and not head.startswith(b"RIFF"):
+                continue
+            return mime_type
+    return None
+
+
+async def read_upload(upload: UploadFile, max_bytes: int, chunk_size: int) -> Tuple[bytes, str]:
+    """Read the upload in chunks, enforcing ``max_bytes`` and checking magic bytes.
+
+    Returns the payload and the mime type detected from its content.
+    """
+    buffer = bytearray()
+    mime_type: Optional[str] = None
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise UploadTooLarge(f"Uploaded file exceeds the {max_bytes} byte limit.")
+        if mime_type is None and len(buffer) >= 12:
+            mime_type = sniff_mime_type(bytes(buffer[:12]))
+            if mime_type is None:
+                raise UnsupportedImage("Uploaded file is not a supported image format.")
+
+    if buffer and mime_type is None:
+        mime_type = sniff_mime_type(bytes(buffer))
+        if mime_type is None:
+            raise UnsupportedImage("Uploaded file is not a supported image format.")
+    return bytes(buffer), mime_type or ""
+
+
+def _strip_jpeg_metadata(data: bytes) -> bytes:
+    """Drop EXIF, XMP and IPTC segments from a JPEG without decoding the image data."""
+    output = bytearray(data[:2])
+    pos = 2
+    while pos + 4 <= len(data) and data[pos] == 0xFF:
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker == 0xDA:
+            # Start of scan: the compressed image data follows.
+            break
+        end = pos + 2 + int.from_bytes(data[pos + 2:pos + 4], "big")
+        if marker not in _JPEG_METADATA_MARKERS:
+            output += data[pos:end]
+        pos = end
+    output += data[pos:]
+    return bytes(output)
+
+
+def prepare_image(image_bytes: bytes, max_side: int, quality: int) -> PreparedImage:
+    """Downscale to ``max_side`` and re-encode as JPEG without EXIF metadata.
+
+    The upload is never made bigger: when the re-encode is not smaller and
+    the model accepts the original format, the original bytes are sent
+    instead, with JPEG metadata dropped losslessly unless the image relies
+    on its EXIF orientation.
+
+    CPU bound; callers on the event loop should run it in a worker thread.
+    """
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            original_size = img.size
+            original_format = img.format
+            oriented = img.getexif().get(_EXIF_ORIENTATION, 1) == 1
+            # JPEG can decode straight to a reduced scale, which is much cheaper.
+            img.draft("RGB", (max_side, max_side))
+            img = ImageOps.exif_transpose(img)
+            if max(img.size) > max_side:
+                img.thumbnail((max_side, max_side), Image.LANCZOS)
+            if img.mode in ("RGBA", "LA", "P"):
+                img = img.convert("RGBA")
+                background = Image.new("RGB", img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel("A"))
+                img = background
+            elif img.mode != "RGB":
+                img = img.convert("RGB")
+
+            output = io.BytesIO()
+            img.save(output, format="JPEG", quality=quality)
+            sent_size = img.size
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        logger.info("Could not decode uploaded image", extra={"reason": str(exc)})
+        raise ImageRejected("Uploaded image could not be decoded.") from exc
+
+    data = output.getvalue()
+    mime_type = "image/jpeg"
+    if len(data) >= len(image_bytes) and original_format in _PASSTHROUGH_FORMATS:
+        data = _strip_jpeg_metadata(image_bytes) if original_format == "JPEG" and oriented else image_bytes
+        mime_type = _PASSTHROUGH_FORMATS[original_format]
+        sent_size = original_size
+    stats = PreprocessStats(
+        original_bytes=len(image_bytes),
+        sent_bytes=len(data),
+        original_size=original_size,
+        sent_size=sent_size,
+    )
+    logger.info(
+        "Preprocessed image",
+        extra={"original_bytes": stats.original_bytes, "sent_bytes": stats.sent_bytes, "sent_size": sent_size},
+    )
+    return PreparedImage(data=data, mime_type=mime_type, stats=stats)
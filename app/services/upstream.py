@@ -0,0 +1,244 @@
+"""Long-lived async OpenAI client with concurrency limits, backpressure and budgeted retries."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import random
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, AsyncIterator, Optional
+
+import httpx
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI
+
+from app.config import Settings, get_settings
+from app.services.metrics import UPSTREAM_CALLS, stage
+
+logger = logging.getLogger("strikenet.upstream")
+logger.setLevel(logging.INFO)
+
+
+class UpstreamOverloaded(RuntimeError):
+    """Raised when no upstream slot frees up in time; callers should answer 503."""
+
+    def __init__(self, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """Caps in-flight upstream calls and bounds how many callers may queue for a slot."""
+
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float) -> None:
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._max_queue = max_queue
+        self._queue_timeout = queue_timeout
+        self._waiting = 0
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self._queue_timeout))
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+        elif self._waiting >= self._max_queue:
+            raise UpstreamOverloaded("Upstream wait queue is full.", self.retry_after)
+        else:
+            self._waiting += 1
+            try:
+                with stage("queue_wait"):
+                    await asyncio.wait_for(self._semaphore.acquire(), self._queue_timeout)
+            except asyncio.TimeoutError as exc:
+                raise UpstreamOverloaded("Timed out waiting for an upstream slot.", self.retry_after) from exc
+            finally:
+                self._waiting -= 1
+
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+
+
+class RetryBudget:
+    """Token bucket limiting retries to a fraction of recent requests.
+
+    Every request deposits ``ratio`` tokens, every retry withdraws one, and a
+    floor of ``min_per_second`` retries is always available so a quiet
+    service can still recover from a transient error.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float) -> None:
+        self._ratio = ratio
+        self._min_per_second = min_per_second
+        self._capacity = max(1.0, min_per_second * 10)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._min_per_second)
+        self._updated = now
+
+    def deposit(self) -> None:
+        self._refill()
+        self._tokens = min(self._capacity, self._tokens + self._ratio)
+
+    def try_withdraw(self) -> bool:
+        self._refill()
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return isinstance(exc, APIConnectionError)
+
+
+def _retry_after_hint(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class UpstreamClient:
+    """Process-wide OpenAI client shared by every request."""
+
+    def __init__(self, settings: Settings) -> None:
+        http_client = httpx.AsyncClient(
+            http2=settings.openai_http2,
+            limits=httpx.Limits(
+                max_connections=settings.openai_max_connections,
+                max_keepalive_connections=settings.openai_max_keepalive_connections,
+                keepalive_expiry=settings.openai_keepalive_expiry_seconds,
+            ),
+            timeout=httpx.Timeout(settings.openai_timeout_seconds, connect=5.0),
+        )
+        # Retries are handled here so they count against the shared budget.
+        self.openai = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            max_retries=0,
+            http_client=http_client,
+        )
+        self.limiter = ConcurrencyLimiter(
+            settings.openai_max_in_flight,
+            settings.openai_max_queue,
+            settings.openai_queue_timeout_seconds,
+        )
+        self._budget = RetryBudget(
+            settings.openai_retry_budget_ratio,
+            settings.openai_retry_budget_min_per_second,
+        )
+        self._max_retries = settings.openai_max_retries
+        self._base_delay = settings.openai_retry_base_delay_seconds
+        self._max_delay = settings.openai_retry_max_delay_seconds
+
+    def _retry_delay(self, exc: Exception, attempt: int) -> Optional[float]:
+        """Return how long to back off before retrying, or ``None`` to give up."""
+        if not _is_retryable(exc) or attempt >= self._max_retries:
+            return None
+        if not self._budget.try_withdraw():
+            logger.warning("Retry budget exhausted; not retrying upstream error")
+            return None
+        delay = random.uniform(0, min(self._max_delay, self._base_delay * 2 ** attempt))
+        hint = _retry_after_hint(exc)
+        if hint is not None:
+            delay = max(delay, min(hint, self._max_delay))
+        UPSTREAM_CALLS.inc("retry")
+        logger.warning(
+            "Retrying upstream call",
+            extra={"attempt": attempt + 1, "delay_seconds": round(delay, 3), "error": type(exc).__name__},
+        )
+        return delay
+
+    async def create_response(self, **kwargs: Any) -> Any:
+        """Call ``responses.create`` under the concurrency cap with jittered retries."""
+        self._budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                async with self.limiter.slot():
+                    with stage("upstream"):
+                        response = await self.openai.responses.create(**kwargs)
+                UPSTREAM_CALLS.inc("ok")
+                return response
+            except UpstreamOverloaded:
+                UPSTREAM_CALLS.inc("overloaded")
+                raise
+            except Exception as exc:  # noqa: BLE001 - filtered by _retry_delay
+                UPSTREAM_CALLS.inc("error")
+                delay = self._retry_delay(exc, attempt)
+                if delay is None:
+                    raise
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def stream_response(self, **kwargs: Any) -> AsyncIterator[Any]:
+        """Stream ``responses.create`` events, holding an upstream slot until the stream ends.
+
+        Failures to open the stream are retried like ``create_response``;
+        once events have been yielded, errors propagate to the caller.
+        """
+        self._budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                async with self.limiter.slot():
+                    try:
+                        stream = await self.openai.responses.create(stream=True, **kwargs)
+                    except Exception as exc:  # noqa: BLE001 - filtered by _retry_delay
+                        UPSTREAM_CALLS.inc("error")
+                        delay = self._retry_delay(exc, attempt)
+                        if delay is None:
+                            raise
+                    else:
+                        try:
+                            with stage("upstream"):
+                                async for event in stream:
+                                    yield event
+                        finally:
+                            await stream.close()
+                        UPSTREAM_CALLS.inc("ok")
+                        return
+            except UpstreamOverloaded:
+                UPSTREAM_CALLS.inc("overloaded")
+                raise
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def close(self) -> None:
+        await self.openai.close()
+
+
+@lru_cache()
+def get_upstream() -> UpstreamClient:
+    return UpstreamClient(get_settings())
+
+
+async def close_upstream() -> None:
+    """Close the shared client if one was created; called on application shutdown."""
+    if get_upstream.cache_info().currsize:
+        await get_upstream().close()
+        get_upstream.cache_clear()
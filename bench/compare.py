@@ -0,0 +1,52 @@
+"""Compare two load-test reports level by level.
+
+    python -m bench.compare baseline.json candidate.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from typing import Any, Dict, Optional
+
+_METRICS = (
+    ("requests_per_s", lambda level: level["requests_per_s"]),
+    ("p50_ms", lambda level: level["latency_ms"]["p50"]),
+    ("p95_ms", lambda level: level["latency_ms"]["p95"]),
+    ("p99_ms", lambda level: level["latency_ms"]["p99"]),
+    ("peak_rss_mb", lambda level: level["peak_rss_mb"]),
+    ("loop_lag_mean_ms", lambda level: (level.get("event_loop_lag") or {}).get("mean_ms")),
+)
+
+
+def _change(before: Optional[float], after: Optional[float]) -> str:
+    if before is None or after is None:
+        return "n/a"
+    if before == 0:
+        return f"{after - before:+.3f}"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any]) -> None:
+    print(f"baseline {baseline['meta'].get('revision')}  ->  candidate {candidate['meta'].get('revision')}")
+    candidate_levels = {level["concurrency"]: level for level in candidate["levels"]}
+    for level in baseline["levels"]:
+        other = candidate_levels.get(level["concurrency"])
+        if other is None:
+            continue
+        print(f"\nconcurrency {level['concurrency']}")
+        for name, metric in _METRICS:
+            before, after = metric(level), metric(other)
+            print(f"  {name:<18} {before!s:>12} {after!s:>12}  {_change(before, after)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+    with open(args.baseline) as baseline, open(args.candidate) as candidate:
+        compare(json.load(baseline), json.load(candidate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Local stand-in for the OpenAI Responses API used by the load-test harness.
+
+Run with ``python -m bench.fake_openai --port 8911 --latency-ms 1500`` and point
+the API at it with ``STRIKENET_OPENAI_BASE_URL=http://127.0.0.1:8911/v1``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Canned answers; sent as bare JSON for structured-output requests and fenced otherwise.
+CANNED_ANSWERS: List[Dict[str, Any]] = [
+    {
+        "label": "peacock",
+        "confidence": 0.95,
+        "invasive": False,
+        "hunting_allowed": False,
+        "details": (
+            "Pavo cristatus. Peacocks are large, colorful birds known for their iridescent tail feathers. "
+            "They prefer open forests, grasslands, and areas near water."
+        ),
+    },
+    {
+        "label": "red lionfish",
+        "confidence": 0.92,
+        "invasive": True,
+        "hunting_allowed": True,
+        "details": "Pterois volitans; venomous spines, reef predator.",
+    },
+    {
+        "label": "green iguana",
+        "confidence": 0.88,
+        "invasive": True,
+        "hunting_allowed": True,
+        "details": "Iguana iguana; large green lizard often basking near canals.",
+    },
+    {
+        "label": "queen angelfish",
+        "confidence": 0.45,
+        "invasive": False,
+        "hunting_allowed": False,
+        "details": "Holacanthus ciliaris; native reef angelfish.",
+    },
+]
+
+
+def _count_images(body: Dict[str, Any]) -> int:
+    count = 0
+    for message in body.get("input", []):
+        content = message.get("content", [])
+        if isinstance(content, list):
+            count += sum(1 for part in content if part.get("type") == "input_image")
+    return count
+
+
+def _answer(with_details: bool) -> Dict[str, Any]:
+    answer = random.choice(CANNED_ANSWERS)
+    return answer if with_details else {key: value for key, value in answer.items() if key != "details"}
+
+
+def _answer_text(image_count: int, structured: bool, with_details: bool) -> str:
+    if image_count <= 1:
+        payload: Any = _answer(with_details)
+    else:
+        payload = [{"index": index, **_answer(with_details)} for index in range(image_count)]
+        if structured:
+            payload = {"predictions": payload}
+    if structured:
+        return json.dumps(payload)
+    return "```json\n" + json.dumps(payload, indent=2) + "\n```"
+
+
+async def _stream_events(body: Dict[str, Any], delta_ms: float) -> AsyncIterator[str]:
+    """Emit the Responses API streaming events for ``body`` a few characters at a time."""
+    text = body["output"][0]["content"][0]["text"]
+    item_id = body["output"][0]["id"]
+    sequence = 0
+
+    def event(payload: Dict[str, Any]) -> str:
+        nonlocal sequence
+        payload["sequence_number"] = sequence
+        sequence += 1
+        return f"event: {payload['type']}\ndata: {json.dumps(payload)}\n\n"
+
+    in_progress = {**body, "status": "in_progress", "output": [], "usage": None}
+    yield event({"type": "response.created", "response": in_progress})
+    for start in range(0, len(text), 8):
+        await asyncio.sleep(delta_ms / 1000)
+        yield event({
+            "type": "response.output_text.delta",
+            "item_id": item_id,
+            "output_index": 0,
+            "content_index": 0,
+            "delta": text[start:start + 8],
+            "logprobs": [],
+        })
+    yield event({"type": "response.completed", "response": body})
+
+
+def _response_body(model: str, text: str, input_tokens: int) -> Dict[str, Any]:
+    output_tokens = max(1, len(text) // 4)
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": model,
+        "output": [
+            {
+                "type": "message",
+                "id": f"msg_{uuid.uuid4().hex}",
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }
+        ],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": output_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + output_tokens,
+        },
+    }
+
+
+def _error(status_code: int, message: str, error_type: str) -> JSONResponse:
+    headers = {"retry-after": "1"} if status_code == 429 else {}
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": {"message": message, "type": error_type, "param": None, "code": None}},
+        headers=headers,
+    )
+
+
+def create_app(
+    latency_ms: float, jitter_ms: float, error_rate: float, rate_limit_rate: float, delta_ms: float = 5.0
+) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI Responses API")
+    app.state.calls = 0
+
+    @app.post("/v1/responses")
+    async def create_response(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        await asyncio.sleep(max(0.0, random.gauss(latency_ms, jitter_ms)) / 1000)
+
+        roll = random.random()
+        if roll < rate_limit_rate:
+            return _error(429, "Rate limit reached (simulated).", "rate_limit_error")
+        if roll < rate_limit_rate + error_rate:
+            return _error(500, "Internal server error (simulated).", "server_error")
+
+        image_count = _count_images(body)
+        text_format = body.get("text", {}).get("format", {})
+        structured = text_format.get("type") == "json_schema"
+        # Strict schemas only get the fields they ask for, like the real API.
+        with_details = not structured or "details" in text_format.get("schema", {}).get("properties", {})
+        # Roughly what a low-detail image plus prompt costs; good enough for relative comparisons.
+        input_tokens = 150 + 85 * max(1, image_count)
+        response = _response_body(body.get("model", "fake"), _answer_text(image_count, structured, with_details), input_tokens)
+        if body.get("stream"):
+            return StreamingResponse(_stream_events(response, delta_ms), media_type="text/event-stream")
+        return response
+
+    @app.get("/stats")
+    async def stats() -> Dict[str, int]:
+        return {"calls": app.state.calls}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8911)
+    parser.add_argument("--latency-ms", type=float, default=1500.0, help="Mean simulated model latency.")
+    parser.add_argument("--jitter-ms", type=float, default=300.0, help="Standard deviation of the latency.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with 500.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of calls answered with 429.")
+    parser.add_argument("--delta-ms", type=float, default=5.0, help="Delay between streamed text deltas.")
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate, args.delta_ms)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""Drive /api/classify at fixed concurrency levels and report latency and resource figures as JSON.
+
+By default the harness starts the fake Responses API and the StrikeNet API as
+subprocesses, so no OpenAI credentials or spend are involved::
+
+    python -m bench.loadtest --concurrency 1,8,32 --requests 200 --output run.json
+
+Pass ``--target`` to measure an already running server instead.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+from PIL import Image
+
+
+@dataclass
+class LevelResult:
+    concurrency: int
+    latencies_ms: List[float] = field(default_factory=list)
+    statuses: Dict[str, int] = field(default_factory=dict)
+    duration_s: float = 0.0
+
+
+def build_corpus(sides: Sequence[int], per_size: int, seed: int) -> List[bytes]:
+    """Generate noisy JPEG photos of each size; noise keeps them from compressing unrealistically well."""
+    rng = random.Random(seed)
+    corpus = []
+    for side in sides:
+        for _ in range(per_size):
+            noise = Image.effect_noise((side, side * 3 // 4), rng.uniform(20, 80)).convert("RGB")
+            tint = Image.new("RGB", noise.size, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+            buffer = io.BytesIO()
+            Image.blend(noise, tint, 0.5).save(buffer, format="JPEG", quality=90)
+            corpus.append(buffer.getvalue())
+    return corpus
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 3)
+
+
+def peak_rss_mb(pid: Optional[int]) -> Optional[float]:
+    """Peak resident set size of ``pid`` since start or the last ``reset_peak_rss`` (Linux only)."""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+def reset_peak_rss(pid: Optional[int]) -> bool:
+    """Reset the peak RSS of ``pid`` so the next reading covers only what follows."""
+    if pid is None:
+        return False
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def loop_lag_delta(before: Dict[str, Any], after: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Summarise event-loop lag samples recorded between two /api/stats snapshots."""
+    if not before or not after:
+        return None
+    count = after["count"] - before["count"]
+    if count <= 0:
+        return None
+    buckets = {bound: after["buckets_ms"][bound] - before["buckets_ms"].get(bound, 0) for bound in after["buckets_ms"]}
+
+    def upper_bound(fraction: float) -> str:
+        for bound, cumulative in buckets.items():
+            if cumulative >= fraction * count:
+                return bound
+        return "+Inf"
+
+    return {
+        "samples": count,
+        "mean_ms": round((after["sum_ms"] - before["sum_ms"]) / count, 3),
+        "p99_le_ms": upper_bound(0.99),
+        "max_ms_since_start": after["max_ms"],
+    }
+
+
+async def fetch_loop_stats(client: httpx.AsyncClient) -> Dict[str, Any]:
+    try:
+        response = await client.get("/api/stats")
+        return response.json().get("event_loop", {})
+    except (httpx.HTTPError, ValueError):
+        return {}
+
+
+async def run_level(
+    client: httpx.AsyncClient, corpus: List[bytes], concurrency: int, total: int, unique: bool
+) -> LevelResult:
+    result = LevelResult(concurrency=concurrency)
+    remaining = iter(range(total))
+
+    async def worker() -> None:
+        for index in remaining:
+            payload = corpus[index % len(corpus)]
+            if unique:
+                # Trailing bytes after the JPEG end marker change the digest without changing the image.
+                payload = payload + os.urandom(8)
+            started = time.perf_counter()
+            try:
+                response = await client.post(
+                    "/api/classify", files={"image": (f"bench-{index}.jpg", payload, "image/jpeg")}
+                )
+                key = str(response.status_code)
+            except httpx.HTTPError as exc:
+                key = type(exc).__name__
+            result.latencies_ms.append((time.perf_counter() - started) * 1000)
+            result.statuses[key] = result.statuses.get(key, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.duration_s = time.perf_counter() - started
+    return result
+
+
+def summarise(result: LevelResult, rss: Optional[float], lag: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    latencies = sorted(result.latencies_ms)
+    total = len(latencies)
+    return {
+        "concurrency": result.concurrency,
+        "requests": total,
+        "statuses": result.statuses,
+        "duration_s": round(result.duration_s, 3),
+        "requests_per_s": round(total / result.duration_s, 3) if result.duration_s else None,
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "mean": round(sum(latencies) / total, 3) if total else None,
+            "max": round(latencies[-1], 3) if total else None,
+        },
+        "peak_rss_mb": rss,
+        "event_loop_lag": lag,
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _wait_until_up(url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not come up within {timeout} seconds.")
+
+
+def spawn_servers(args: argparse.Namespace, workdir: str) -> List[subprocess.Popen]:
+    fake = subprocess.Popen(
+        [
+            sys.executable, "-m", "bench.fake_openai",
+            "--port", str(args.fake_port),
+            "--latency-ms", str(args.latency_ms),
+            "--jitter-ms", str(args.jitter_ms),
+            "--error-rate", str(args.error_rate),
+            "--rate-limit-rate", str(args.rate_limit_rate),
+        ]
+    )
+    env = {
+        **os.environ,
+        "STRIKENET_OPENAI_API_KEY": "bench",
+        "STRIKENET_OPENAI_BASE_URL": f"http://127.0.0.1:{args.fake_port}/v1",
+        "STRIKENET_CACHE_ENABLED": "true" if args.with_cache else "false",
+        "STRIKENET_CACHE_DB_PATH": "",
+        "STRIKENET_JOB_DB_PATH": os.path.join(workdir, "jobs.sqlite3"),
+        "STRIKENET_PERSISTENCE_DB_PATH": os.path.join(workdir, "results.sqlite3"),
+    }
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.api_port), "--log-level", "warning"],
+        env=env,
+    )
+    servers = [fake, api]
+    try:
+        _wait_until_up(f"http://127.0.0.1:{args.fake_port}/stats", 20)
+        _wait_until_up(f"http://127.0.0.1:{args.api_port}/health", 20)
+    except RuntimeError:
+        stop_servers(servers)
+        raise
+    return servers
+
+
+def stop_servers(servers: List[subprocess.Popen]) -> None:
+    for server in servers:
+        server.terminate()
+    for server in servers:
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+async def run(args: argparse.Namespace, target: str, server_pid: Optional[int]) -> Dict[str, Any]:
+    corpus = build_corpus(args.sizes, args.images_per_size, args.seed)
+    levels = []
+    peaks: List[Optional[float]] = []
+    max_concurrency = max(args.concurrency)
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+    async with httpx.AsyncClient(base_url=target, limits=limits, timeout=args.timeout) as client:
+        if args.warmup:
+            await run_level(client, corpus, min(args.concurrency), args.warmup, args.unique)
+        for concurrency in args.concurrency:
+            # Read before resetting so the whole-run peak still covers everything so far.
+            peaks.append(peak_rss_mb(server_pid))
+            # Without a reset each level would inherit the peak of the levels before it.
+            rss_reset = reset_peak_rss(server_pid)
+            before = await fetch_loop_stats(client)
+            result = await run_level(client, corpus, concurrency, args.requests, args.unique)
+            after = await fetch_loop_stats(client)
+            rss = peak_rss_mb(server_pid) if rss_reset else None
+            levels.append(summarise(result, rss, loop_lag_delta(before, after)))
+            print(json.dumps(levels[-1]), file=sys.stderr)
+        peaks.append(peak_rss_mb(server_pid))
+
+    return {
+        "meta": {
+            "revision": _git_revision(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "target": target,
+            "corpus": {"sides": args.sizes, "images": len(corpus), "bytes": [len(image) for image in corpus]},
+            "fake_upstream": None if args.target else {
+                "latency_ms": args.latency_ms,
+                "jitter_ms": args.jitter_ms,
+                "error_rate": args.error_rate,
+                "rate_limit_rate": args.rate_limit_rate,
+            },
+            "unique_payloads": args.unique,
+            "with_cache": args.with_cache,
+            "peak_rss_mb": max((peak for peak in peaks if peak is not None), default=None),
+        },
+        "levels": levels,
+    }
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", help="Base URL of a running API; skips spawning servers.")
+    parser.add_argument("--server-pid", type=int, help="PID of the --target server, for peak RSS.")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level.")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests sent first.")
+    parser.add_argument("--sizes", type=_int_list, default=[640, 1600, 4000], help="Image widths in the corpus.")
+    parser.add_argument("--images-per-size", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument(
+        "--no-unique", dest="unique", action="store_false",
+        help="Send identical payloads repeatedly instead of making every request distinct.",
+    )
+    parser.add_argument("--with-cache", action="store_true", help="Keep the result cache enabled on spawned servers.")
+    parser.add_argument("--api-port", type=int, default=8910)
+    parser.add_argument("--fake-port", type=int, default=8911)
+    parser.add_argument("--latency-ms", type=float, default=1500.0)
+    parser.add_argument("--jitter-ms", type=float, default=300.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args()
+
+    servers: List[subprocess.Popen] = []
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.target:
+            target, server_pid = args.target, args.server_pid
+        else:
+            servers = spawn_servers(args, workdir)
+            target, server_pid = f"http://127.0.0.1:{args.api_port}", servers[1].pid
+        try:
+            report = asyncio.run(run(args, target, server_pid))
+        finally:
+            stop_servers(servers)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()